@@ -5,27 +5,40 @@ MLX Server Admin API Patch
 
 端点：
     GET  /v1/admin/models                    — 列出所有模型及状态
-    GET  /v1/admin/models/{model_id}/stats   — 查询队列状态
-    POST /v1/admin/models/{model_id}/unload  — 卸载模型释放内存
+    GET  /v1/admin/models/{model_id}/stats   — 查询队列状态（embeddings 模型附带缓存命中率与批处理统计）
+    GET  /v1/admin/memory                    — 内存预算与常驻模型
+    GET  /v1/admin/usage                     — 各模型最后请求时间与请求计数
+    GET  /v1/admin/preload                   — 预测预加载命中率与浪费次数
+    POST /v1/admin/models/{model_id}/unload  — 卸载模型释放内存（?mode=soft|hard）
     POST /v1/admin/models/{model_id}/load    — 重新加载模型
+    POST /v1/admin/config/reload             — 重新读取 config.yaml 并应用增删改
 """
 
 from __future__ import annotations
 
+import asyncio
 import dataclasses
 import time
 from http import HTTPStatus
 from pathlib import Path
 
-import yaml
 from fastapi import APIRouter, HTTPException, Request
 from loguru import logger
 
 from app.config import ModelEntryConfig
 from app.core.handler_process import HandlerProcessProxy
+
+import metrics
+from config_store import ConfigStore, LazyFlags
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import CachedEmbeddingsHandler
+from embedding_router import sync_routers
 from lazy_handler_proxy import LazyHandlerProxy
+from memory_scheduler import process_rss_bytes
+from preloader import ArrivalRecorder
 
 _CONFIG_PATH = Path(__file__).parent / "config.yaml"
+_fallback_store: ConfigStore | None = None
 
 admin_router = APIRouter(prefix="/v1/admin", tags=["admin"])
 
@@ -37,21 +50,132 @@ def _registry(request: Request):
     return r
 
 
-def _load_model_cfg(model_id: str) -> ModelEntryConfig:
-    raw = yaml.safe_load(_CONFIG_PATH.read_text())
-    entry = next((m for m in raw.get("models", []) if m.get("model_id") == model_id), None)
+def _store(request: Request) -> ConfigStore:
+    return _app_store(request.app)
+
+
+def _app_store(app) -> ConfigStore:
+    global _fallback_store
+    store = getattr(app.state, "config_store", None)
+    if store is not None:
+        return store
+    if _fallback_store is None:
+        _fallback_store = ConfigStore(_CONFIG_PATH)
+    return _fallback_store
+
+
+def _load_model_cfg(store: ConfigStore, model_id: str) -> ModelEntryConfig:
+    entry = store.model_entry(model_id)
     if entry is None:
         raise HTTPException(404, f"Model '{model_id}' not found in config.yaml")
     return ModelEntryConfig(**entry)
 
 
-def _lazy_flags_for(model_id: str) -> tuple[bool, int]:
-    """Return (is_lazy, idle_timeout) for a model from config.yaml."""
-    raw = yaml.safe_load(_CONFIG_PATH.read_text())
-    entry = next((m for m in raw.get("models", []) if m.get("model_id") == model_id), None)
-    if entry is None:
-        return False, 0
-    return entry.get("lazy", False), entry.get("idle_timeout", 1800)
+# ── registry lifecycle (shared with start_with_admin) ─────────────────────────
+
+async def register_model(app, cfg: ModelEntryConfig, flags: LazyFlags, load_now: bool = False):
+    """Build the handler for one model and add it to the registry.
+
+    Lazy models are wrapped in LazyHandlerProxy and only started if ``load_now``;
+    eager models are always started. Embeddings models listed under
+    ``embedding_batching:`` get a micro-batcher, and the cache (when
+    configured) wraps outermost: cache → batcher → lazy/eager handler.
+    """
+    state = app.state
+    scheduler = getattr(state, "memory_scheduler", None)
+    preloader = getattr(state, "preloader", None)
+    embedding_cache = getattr(state, "embedding_cache", None)
+    model_id = cfg.model_id
+
+    proxy = HandlerProcessProxy(
+        model_cfg_dict=dataclasses.asdict(cfg),
+        model_type=cfg.model_type,
+        model_path=cfg.model_path,
+        model_id=model_id,
+    )
+    queue_config = {
+        "max_concurrency": cfg.max_concurrency,
+        "timeout": cfg.queue_timeout,
+        "queue_size": cfg.queue_size,
+    }
+
+    # Fix 5 & 6: restore lazy wrapper if model is configured as lazy
+    if flags.lazy:
+        handler = LazyHandlerProxy(proxy, queue_config)
+        handler.scheduler = scheduler
+        handler.warm_timeout = flags.warm_timeout
+        if preloader is not None:
+            handler.on_request = preloader.record
+        if load_now:
+            await handler._ensure_started()
+        lazy_proxies = getattr(state, "lazy_proxies", {})
+        lazy_proxies[model_id] = (handler, flags.idle_timeout)
+        state.lazy_proxies = lazy_proxies
+    else:
+        handler = proxy
+        if scheduler is not None:
+            await scheduler.make_room(model_id)
+        load_start = time.monotonic()
+        try:
+            await proxy.start(queue_config)
+        except BaseException:
+            if scheduler is not None:
+                scheduler.release_reservation(model_id)
+            raise
+        metrics.LOADS.inc(model=model_id)
+        metrics.COLD_START_SECONDS.observe(time.monotonic() - load_start, model=model_id, source="cold")
+        rss = await asyncio.to_thread(process_rss_bytes, proxy)
+        if rss:
+            metrics.RSS_AFTER_LOAD_BYTES.observe(rss, model=model_id)
+        if scheduler is not None:
+            scheduler.mark_loaded(model_id, proxy, evictable=False, rss=rss)
+        handler = ArrivalRecorder(proxy, model_id, preloader.record if preloader is not None else None)
+        eager_handlers = getattr(state, "eager_handlers", {})
+        eager_handlers[model_id] = handler
+        state.eager_handlers = eager_handlers
+
+    batching = _app_store(app).section("embedding_batching").get(model_id)
+    if cfg.model_type == "embeddings" and batching is not None:
+        handler = EmbeddingBatcher(handler, model_id, batching)
+        batchers = getattr(state, "embedding_batchers", {})
+        batchers[model_id] = handler
+        state.embedding_batchers = batchers
+
+    # cache hits never reach the handler, so they neither load a lazy model nor count as arrivals
+    if embedding_cache is not None and embedding_cache.applies_to(model_id, cfg.model_type):
+        handler = embedding_cache.wrap(handler, model_id)
+
+    await state.registry.register_model(
+        model_id=model_id,
+        handler=handler,
+        model_type=cfg.model_type,
+        context_length=cfg.context_length,
+    )
+    return handler
+
+
+async def unregister_model(app, model_id: str):
+    """Remove a model from the registry and release everything it holds."""
+    state = app.state
+    lazy_proxies = getattr(state, "lazy_proxies", {})
+    lp_entry = lazy_proxies.get(model_id)
+
+    await state.registry.unregister_model(model_id)
+    if lp_entry is None:
+        # lazy proxies count their own unloads
+        metrics.UNLOADS.inc(model=model_id, mode="hard")
+
+    scheduler = getattr(state, "memory_scheduler", None)
+    if scheduler is not None:
+        scheduler.mark_unloaded(model_id)
+    getattr(state, "embedding_batchers", {}).pop(model_id, None)
+    getattr(state, "eager_handlers", {}).pop(model_id, None)
+
+    # Fix 4 & 6: sync LazyHandlerProxy state and clean lazy_proxies dict
+    if lp_entry is not None:
+        lp_entry[0]._started = False
+        lp_entry[0].release_warm()
+        del lazy_proxies[model_id]
 
 
 @admin_router.get("/models")
@@ -59,17 +183,76 @@ async def admin_list_models(request: Request):
     return {"models": _registry(request).list_models()}
 
 
+def _model_ids(reg) -> list[str]:
+    ids = []
+    for m in reg.list_models():
+        if isinstance(m, dict):
+            ids.append(m.get("id") or m.get("model_id"))
+        else:
+            ids.append(str(m))
+    return [i for i in ids if i]
+
+
+@admin_router.get("/usage")
+async def admin_usage(request: Request):
+    """One-shot usage snapshot for all registered models (replaces per-model stats polling)."""
+    reg = _registry(request)
+    lazy_proxies = getattr(request.app.state, "lazy_proxies", {})
+    eager_handlers = getattr(request.app.state, "eager_handlers", {})
+    models = {}
+    for model_id in _model_ids(reg):
+        lp_entry = lazy_proxies.get(model_id)
+        if lp_entry is not None:
+            models[model_id] = {"lazy": True, **lp_entry[0].usage()}
+        elif model_id in eager_handlers:
+            models[model_id] = {"lazy": False, **eager_handlers[model_id].usage()}
+        else:
+            # virtual models (embedding router) hold no weights of their own
+            models[model_id] = {"lazy": False, "loaded": True}
+    return {"server_time": time.time(), "models": models}
+
+
+@admin_router.get("/memory")
+async def admin_memory(request: Request):
+    scheduler = getattr(request.app.state, "memory_scheduler", None)
+    if scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **scheduler.snapshot()}
+
+
+@admin_router.get("/preload")
+async def admin_preload(request: Request):
+    preloader = getattr(request.app.state, "preloader", None)
+    if preloader is None:
+        return {"enabled": False}
+    return {"enabled": True, **preloader.snapshot()}
+
+
 @admin_router.get("/models/{model_id}/stats")
 async def admin_model_stats(model_id: str, request: Request):
     reg = _registry(request)
     if not reg.has_model(model_id):
         raise HTTPException(404, f"Model '{model_id}' not loaded")
-    stats = await reg.get_handler(model_id).get_queue_stats()
-    return {"model_id": model_id, "queue_stats": stats}
+    handler = reg.get_handler(model_id)
+    body = {"model_id": model_id, "queue_stats": await handler.get_queue_stats()}
+    # eager handlers (and routers) report no limit of their own; clients size their fan-out on it
+    entry = _store(request).model_entry(model_id)
+    if entry is not None and body["queue_stats"].get("max_concurrency") is None:
+        body["queue_stats"]["max_concurrency"] = entry.get("max_concurrency")
+    if isinstance(handler, CachedEmbeddingsHandler):
+        # disk_entries is a sqlite count under the tier's lock: keep it off the loop
+        body["cache"] = await asyncio.to_thread(handler.cache_stats)
+    batcher = getattr(request.app.state, "embedding_batchers", {}).get(model_id)
+    if batcher is not None:
+        body["batching"] = batcher.snapshot()
+    return body
 
 
 @admin_router.post("/models/{model_id}/unload")
-async def admin_unload_model(model_id: str, request: Request):
+async def admin_unload_model(model_id: str, request: Request, mode: str = "hard"):
+    """mode=hard 注销模型并释放全部内存；mode=soft 仅停止子进程，权重保持 mmap 以便快速重载（仅 lazy 模型）"""
+    if mode not in ("soft", "hard"):
+        raise HTTPException(400, f"Unknown unload mode '{mode}' (expected soft|hard)")
     reg = _registry(request)
     if not reg.has_model(model_id):
         raise HTTPException(404, f"Model '{model_id}' not loaded")
@@ -85,15 +268,19 @@ async def admin_unload_model(model_id: str, request: Request):
     except Exception:
         pass
 
-    logger.info(f"Admin: unloading '{model_id}'")
-    await reg.unregister_model(model_id)
-
-    # Fix 4 & 6: sync LazyHandlerProxy state and clean lazy_proxies dict
     lazy_proxies = getattr(request.app.state, "lazy_proxies", {})
     lp_entry = lazy_proxies.get(model_id)
-    if lp_entry is not None:
-        lp_entry[0]._started = False
-        del lazy_proxies[model_id]
+
+    if mode == "soft":
+        if lp_entry is None:
+            raise HTTPException(409, f"Soft unload requires a lazy model; '{model_id}' is eager")
+        logger.info(f"Admin: soft-unloading '{model_id}'")
+        await lp_entry[0].unload(soft=True)
+        logger.info(f"Admin: '{model_id}' soft-unloaded ✓ (weights kept warm)")
+        return {"status": "warm", "model_id": model_id, "timestamp": int(time.time())}
+
+    logger.info(f"Admin: unloading '{model_id}'")
+    await unregister_model(request.app, model_id)
 
     logger.info(f"Admin: '{model_id}' unloaded ✓")
     return {"status": "unloaded", "model_id": model_id, "timestamp": int(time.time())}
@@ -105,42 +292,63 @@ async def admin_load_model(model_id: str, request: Request):
     if reg.has_model(model_id):
         return {"status": "already_loaded", "model_id": model_id}
 
-    cfg = _load_model_cfg(model_id)
-    is_lazy, idle_timeout = _lazy_flags_for(model_id)
+    store = _store(request)
+    cfg = _load_model_cfg(store, model_id)
     logger.info(f"Admin: loading '{model_id}' from {cfg.model_path}")
+    await register_model(request.app, cfg, store.lazy_flags(model_id), load_now=True)
 
-    proxy = HandlerProcessProxy(
-        model_cfg_dict=dataclasses.asdict(cfg),
-        model_type=cfg.model_type,
-        model_path=cfg.model_path,
-        model_id=model_id,
-    )
-    queue_config = {
-        "max_concurrency": cfg.max_concurrency,
-        "timeout": cfg.queue_timeout,
-        "queue_size": cfg.queue_size,
-    }
+    logger.info(f"Admin: '{model_id}' loaded ✓")
+    return {"status": "loaded", "model_id": model_id, "model_path": cfg.model_path}
 
-    # Fix 5 & 6: restore lazy wrapper if model is configured as lazy
-    if is_lazy:
-        handler = LazyHandlerProxy(proxy, queue_config)
-        await handler._ensure_started()
-        lazy_proxies = getattr(request.app.state, "lazy_proxies", {})
-        lazy_proxies[model_id] = (handler, idle_timeout)
-        request.app.state.lazy_proxies = lazy_proxies
-    else:
-        handler = proxy
-        await proxy.start(queue_config)
 
-    await reg.register_model(
-        model_id=model_id,
-        handler=handler,
-        model_type=cfg.model_type,
-        context_length=cfg.context_length,
-    )
+@admin_router.post("/config/reload")
+async def admin_reload_config(request: Request):
+    """重新解析 config.yaml，把新增/删除/修改的模型应用到运行中的 registry（无需重启）"""
+    reg = _registry(request)
+    store = _store(request)
+    diff, new = store.reload()
+    logger.info(f"Admin: config reload {diff.as_dict()}")
 
-    logger.info(f"Admin: '{model_id}' loaded ✓")
-    return {"status": "loaded", "model_id": model_id, "model_path": cfg.model_path}
+    try:
+        for model_id in diff.removed:
+            if reg.has_model(model_id):
+                await unregister_model(request.app, model_id)
+
+        for model_id in diff.modified:
+            # 被手动 unload 过的模型保持未注册状态
+            if reg.has_model(model_id):
+                await unregister_model(request.app, model_id)
+                await register_model(request.app, _load_model_cfg(store, model_id), store.lazy_flags(model_id))
+
+        for model_id in diff.added:
+            # left over from an earlier reload that failed before commit
+            if reg.has_model(model_id):
+                await unregister_model(request.app, model_id)
+            await register_model(request.app, _load_model_cfg(store, model_id), store.lazy_flags(model_id))
+
+        lazy_proxies = getattr(request.app.state, "lazy_proxies", {})
+        for model_id in diff.flags_changed:
+            lp_entry = lazy_proxies.get(model_id)
+            if lp_entry is not None:
+                flags = store.lazy_flags(model_id)
+                lp_entry[0].warm_timeout = flags.warm_timeout
+                lazy_proxies[model_id] = (lp_entry[0], flags.idle_timeout)
+
+        scheduler = getattr(request.app.state, "memory_scheduler", None)
+        if scheduler is not None:
+            scheduler.configure(store.section("memory"))
+
+        batching = store.section("embedding_batching")
+        for model_id, batcher in getattr(request.app.state, "embedding_batchers", {}).items():
+            if model_id in batching:
+                batcher.configure(batching[model_id])
+        await sync_routers(request.app, store.section("embedding_router"))
+    except Exception as e:
+        logger.exception(f"Admin: config reload failed; keeping the previously applied config as baseline: {e}")
+        raise HTTPException(500, f"Config reload failed (not committed, retry after fixing): {e}")
+    store.commit(new)
+
+    return {"status": "reloaded", **diff.as_dict(), "timestamp": int(time.time())}
 
 
 def install(app):
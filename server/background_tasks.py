@@ -0,0 +1,26 @@
+"""
+Fire-and-forget tasks that are neither garbage-collected nor silent.
+The event loop keeps only weak references to tasks, so callers hold them in
+a set until they finish; failures are logged instead of surfacing as
+"Task exception was never retrieved" at interpreter exit.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Coroutine
+
+from loguru import logger
+
+
+def spawn(coro: Coroutine, tasks: set[asyncio.Task], what: str) -> asyncio.Task:
+    """Run ``coro`` as a task kept in ``tasks`` until done; ``what`` labels its failure log."""
+    task = asyncio.get_running_loop().create_task(coro)
+    tasks.add(task)
+
+    def done(t: asyncio.Task):
+        tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.opt(exception=t.exception()).error(f"{what} failed: {t.exception()!r}")
+
+    task.add_done_callback(done)
+    return task
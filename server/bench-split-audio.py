@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark the transcribe daemon's chunk splitters on a synthetic recording.
+
+  seek:    one ffmpeg process per chunk (-ss/-t), re-opens and re-seeks the source
+  segment: one ffmpeg decode + filter pass, segment muxer writes every chunk
+  pipe:    one ffmpeg decode + filter pass, PCM chunks stay in memory
+
+Usage: python3 bench-split-audio.py [--hours 3] [--modes pipe,segment,seek] [--keep]
+"""
+
+import argparse
+import importlib.util
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+DAEMON = Path(__file__).with_name("transcribe-daemon.py")
+
+
+def load_daemon():
+    spec = importlib.util.spec_from_file_location("transcribe_daemon", DAEMON)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_recording(path: Path, hours: float):
+    """AAC tone bursts gated on/off every ~2.5s so silenceremove has work to do."""
+    seconds = int(hours * 3600)
+    expr = "0.3*sin(2*PI*220*t)*gt(sin(2*PI*0.2*t),0)"
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"aevalsrc='{expr}':s=44100:d={seconds}",
+        "-c:a", "aac", "-b:a", "64k",
+        str(path),
+    ], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3.0, help="synthetic recording length")
+    parser.add_argument("--modes", default="pipe,segment,seek", help="comma-separated split modes")
+    parser.add_argument("--keep", action="store_true", help="keep the temp dir")
+    args = parser.parse_args()
+
+    daemon = load_daemon()
+    work = Path(tempfile.mkdtemp(prefix="bench-split-"))
+    try:
+        source = work / "source.m4a"
+        t0 = time.time()
+        make_recording(source, args.hours)
+        print(f"Generated {args.hours:g}h recording in {time.time() - t0:.1f}s: {source}")
+        duration = daemon.get_audio_duration(source)
+
+        for mode in args.modes.split(","):
+            out = work / f"chunks_{mode}"
+            t0 = time.time()
+            first = None
+            count = 0
+            for _ in daemon.iter_split_audio(source, out, duration, mode):
+                if first is None:
+                    first = time.time() - t0
+                count += 1
+            total = time.time() - t0
+            print(f"{mode:>8}: {count} chunks, first chunk {first or 0:.1f}s, total {total:.1f}s")
+    finally:
+        if args.keep:
+            print(f"Kept {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
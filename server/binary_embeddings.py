@@ -0,0 +1,131 @@
+"""
+Compact /v1/embeddings responses.
+A route placed ahead of mlx-server's own POST /v1/embeddings serves every
+embeddings request from one contiguous numpy array. Handlers (cache, router)
+may return that array directly; only the default float JSON encoding turns
+it into Python lists, and the opt-in encodings never do.
+
+  Accept: application/octet-stream, or "encoding_format": "binary"
+      → raw little-endian matrix behind a 16-byte header (HEADER below)
+  "encoding_format": "base64"
+      → OpenAI-compatible JSON, one base64 string per vector
+  "embedding_dtype": "float16" (either mode; default float32)
+
+Header: magic b"EMBD", version u8, dtype u8 (1=f32, 2=f16), reserved u16,
+count u32, dim u32 — followed by count × dim values, row-major.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import struct
+from http import HTTPStatus
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from loguru import logger
+from pydantic import ValidationError
+
+from app.schemas.openai import EmbeddingRequest
+from app.utils.errors import create_error_response
+
+from request_handlers import release_handler, resolve_handler
+
+HEADER = struct.Struct("<4sBBHII")
+MAGIC = b"EMBD"
+VERSION = 1
+DTYPES = {"float32": (1, np.dtype("<f4")), "float16": (2, np.dtype("<f2"))}
+OCTET_STREAM = "application/octet-stream"
+ENCODINGS = ("float", "base64", "binary")
+
+
+def encode_binary(matrix: np.ndarray, dtype_code: int) -> bytes:
+    count, dim = matrix.shape
+    return HEADER.pack(MAGIC, VERSION, dtype_code, 0, count, dim) + matrix.tobytes()
+
+
+def decode_binary(payload: bytes) -> np.ndarray:
+    """Client-side inverse of encode_binary (kept here as the format reference)."""
+    magic, version, code, _, count, dim = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not an EMBD v1 payload")
+    dtype = next(dt for c, dt in DTYPES.values() if c == code)
+    return np.frombuffer(payload, dtype=dtype, offset=HEADER.size).reshape(count, dim)
+
+
+def _error(message: str, status: HTTPStatus, err_type: str = "invalid_request_error") -> JSONResponse:
+    return JSONResponse(content=create_error_response(message, err_type, status), status_code=status)
+
+
+async def binary_embeddings(raw_request: Request):
+    try:
+        body = json.loads(await raw_request.body())
+    except ValueError:
+        return _error("Request body is not valid JSON", HTTPStatus.BAD_REQUEST)
+    if not isinstance(body, dict):
+        return _error("Request body must be a JSON object", HTTPStatus.BAD_REQUEST)
+
+    fmt = body.get("encoding_format") or "float"
+    if OCTET_STREAM in raw_request.headers.get("accept", ""):
+        fmt = "binary"
+    dtype_name = body.pop("embedding_dtype", "float32")
+    if dtype_name not in DTYPES:
+        return _error(f"Unknown embedding_dtype '{dtype_name}' (expected float32|float16)", HTTPStatus.BAD_REQUEST)
+    if fmt not in ENCODINGS:
+        return _error(f"Unknown encoding_format '{fmt}' (expected {'|'.join(ENCODINGS)})", HTTPStatus.BAD_REQUEST)
+    if fmt == "float" and dtype_name == "float16":
+        return _error("embedding_dtype=float16 needs encoding_format base64 or binary", HTTPStatus.BAD_REQUEST)
+
+    # mlx-server's schema only knows float|base64; the encoding is ours from here on
+    body["encoding_format"] = "float"
+    try:
+        request = EmbeddingRequest(**body)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+    try:
+        handler = await resolve_handler(raw_request, request.model)
+        if handler is None:
+            return _error("Model handler not initialized", HTTPStatus.SERVICE_UNAVAILABLE, "service_unavailable")
+        if getattr(handler, "handler_type", "") != "embeddings":
+            return _error(f"Model '{request.model}' is not an embeddings model", HTTPStatus.BAD_REQUEST)
+        try:
+            embeddings = await handler.generate_embeddings_response(request)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception(f"Error processing embedding request: {type(e).__name__}: {e}")
+            return _error(str(e), HTTPStatus.INTERNAL_SERVER_ERROR, "internal_error")
+    finally:
+        await release_handler(raw_request)
+
+    code, dtype = DTYPES[dtype_name]
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32), dtype=dtype)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(embeddings), -1) if matrix.size else matrix.reshape(0, 0)
+    # request.model names the concrete model when a virtual router picked it
+    if fmt == "binary":
+        return Response(
+            content=encode_binary(matrix, code),
+            media_type=OCTET_STREAM,
+            headers={"X-Embedding-Model": request.model, "X-Embedding-Dtype": dtype_name},
+        )
+    if fmt == "float":
+        rows = matrix.tolist()      # the one place vectors become Python floats
+    else:
+        rows = [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+    data = [{"object": "embedding", "index": i, "embedding": row} for i, row in enumerate(rows)]
+    return Response(
+        content=json.dumps({"object": "list", "data": data, "model": request.model, "usage": None}),
+        media_type="application/json",
+    )
+
+
+def install(app):
+    router = APIRouter()
+    router.add_api_route("/v1/embeddings", binary_embeddings, methods=["POST"], include_in_schema=False)
+    # first match wins: ours must sit in front of mlx-server's route
+    app.router.routes.insert(0, router.routes[0])
+    logger.info("Embeddings route installed: POST /v1/embeddings (float, base64 f32/f16, application/octet-stream)")
@@ -0,0 +1,121 @@
+"""
+Parsed, indexed view of config.yaml shared by start_with_admin and the admin API.
+The file is parsed once and re-parsed only when its mtime changes (or on an
+explicit reload); lookups go through a model_id → entry index.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import yaml
+
+# Per-model keys understood by start_with_admin but not by mlx-server's ModelEntryConfig
+_EXTENSION_KEYS = ("lazy", "idle_timeout", "warm_timeout")
+_DEFAULT_IDLE_TIMEOUT = 1800
+
+
+@dataclass(frozen=True)
+class LazyFlags:
+    lazy: bool = False
+    idle_timeout: int = _DEFAULT_IDLE_TIMEOUT
+    warm_timeout: int = 0
+
+
+@dataclass(frozen=True)
+class ConfigDiff:
+    added: tuple[str, ...] = ()
+    removed: tuple[str, ...] = ()
+    modified: tuple[str, ...] = ()           # mlx-server entry changed: needs re-register
+    flags_changed: tuple[str, ...] = ()      # only lazy/idle/warm flags changed
+
+    def as_dict(self) -> dict:
+        return {
+            "added": list(self.added),
+            "removed": list(self.removed),
+            "modified": list(self.modified),
+            "flags_changed": list(self.flags_changed),
+        }
+
+
+class _Snapshot:
+    def __init__(self, raw: dict):
+        self.raw = raw
+        self.entries: dict[str, dict] = {}
+        self.flags: dict[str, LazyFlags] = {}
+        lazy_block = raw.get("lazy") or {}
+        for m in raw.get("models") or []:
+            model_id = m.get("model_id")
+            if not model_id:
+                continue
+            # top-level lazy: block first, per-model keys override it
+            merged = {**(lazy_block.get(model_id) or {}), **{k: m[k] for k in _EXTENSION_KEYS if k in m}}
+            self.flags[model_id] = LazyFlags(
+                lazy=bool(merged.get("lazy", False)),
+                idle_timeout=int(merged.get("idle_timeout", _DEFAULT_IDLE_TIMEOUT)),
+                warm_timeout=int(merged.get("warm_timeout", 0)),
+            )
+            self.entries[model_id] = {k: v for k, v in m.items() if k not in _EXTENSION_KEYS}
+
+
+class ConfigStore:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp: tuple[int, int] | None = None
+        self._snap = _Snapshot({})
+        self._applied = self._refresh()
+
+    def _refresh(self, force: bool = False) -> _Snapshot:
+        with self._lock:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+            if force or stamp != self._stamp:
+                self._snap = _Snapshot(yaml.safe_load(self.path.read_text()) or {})
+                self._stamp = stamp
+            return self._snap
+
+    # ── lookups (re-parse only if the file changed) ───────────────────────
+
+    def model_ids(self) -> list[str]:
+        return list(self._refresh().entries)
+
+    def model_entry(self, model_id: str) -> dict | None:
+        """Entry for mlx-server's ModelEntryConfig (extension keys stripped)."""
+        entry = self._refresh().entries.get(model_id)
+        return dict(entry) if entry is not None else None
+
+    def lazy_flags(self, model_id: str) -> LazyFlags:
+        return self._refresh().flags.get(model_id, LazyFlags(lazy=False, idle_timeout=0))
+
+    def section(self, name: str) -> dict:
+        return self._refresh().raw.get(name) or {}
+
+    # ── explicit reload ───────────────────────────────────────────────────
+
+    def reload(self) -> tuple[ConfigDiff, _Snapshot]:
+        """Re-parse and diff against the config last applied to the registry.
+
+        Nothing is marked applied here: the caller passes the returned snapshot
+        to commit() once the registry changes have succeeded, so a failed
+        apply is diffed again on the next reload.
+        """
+        new = self._refresh(force=True)
+        old = self._applied
+        added = tuple(m for m in new.entries if m not in old.entries)
+        removed = tuple(m for m in old.entries if m not in new.entries)
+        modified, flags_changed = [], []
+        for m in new.entries:
+            if m not in old.entries:
+                continue
+            if new.entries[m] != old.entries[m] or new.flags[m].lazy != old.flags[m].lazy:
+                modified.append(m)
+            elif new.flags[m] != old.flags[m]:
+                flags_changed.append(m)
+        return ConfigDiff(added, removed, tuple(modified), tuple(flags_changed)), new
+
+    def commit(self, new: _Snapshot):
+        """Record ``new`` (from reload) as the config the registry now reflects."""
+        self._applied = new
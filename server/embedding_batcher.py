@@ -0,0 +1,162 @@
+"""
+Dynamic micro-batching for embeddings handlers.
+Concurrent /v1/embeddings requests for the same model are held for up to
+window_ms (or until max_batch_tokens is reached), sorted by length, run as
+one batched forward pass per token budget, and split back to their callers.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+
+from background_tasks import spawn
+
+_DEFAULT_WINDOW_MS = 3.0
+_DEFAULT_MAX_BATCH_TOKENS = 8192
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without the tokenizer (it lives in the model subprocess).
+
+    UTF-8 bytes / 3 sits between English (~4 chars/token) and CJK (~1 char
+    = 3 bytes/token), which is close enough for budgeting a batch.
+    """
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+@dataclass
+class _Pending:
+    request: Any
+    texts: list[str]
+    future: asyncio.Future
+
+
+@dataclass
+class _Group:
+    items: list[_Pending] = field(default_factory=list)
+    tokens: int = 0
+    timer: asyncio.TimerHandle | None = None
+
+
+class EmbeddingBatcher:
+    """Wraps an embeddings handler; everything except generate_embeddings_response passes through."""
+
+    def __init__(self, handler: Any, model_id: str, raw: dict | None = None):
+        self._handler = handler
+        self._model_id = model_id
+        # requests only share a batch when all non-input parameters match
+        self._groups: dict[tuple, _Group] = {}
+        # running flushes (see background_tasks.spawn)
+        self._tasks: set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.configure(raw or {})
+
+    def configure(self, raw: dict):
+        """(Re)apply this model's ``embedding_batching:`` entry."""
+        self.window_s = float(raw.get("window_ms", _DEFAULT_WINDOW_MS)) / 1000
+        self.max_batch_tokens = int(raw.get("max_batch_tokens", _DEFAULT_MAX_BATCH_TOKENS))
+
+    def __getattr__(self, name: str):
+        return getattr(self._handler, name)
+
+    async def generate_embeddings_response(self, request):
+        texts = [request.input] if isinstance(request.input, str) else request.input
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return await self._handler.generate_embeddings_response(request)
+
+        loop = asyncio.get_running_loop()
+        key = tuple(sorted((k, repr(v)) for k, v in request.model_dump(exclude={"input"}).items()))
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group()
+            group.timer = loop.call_later(self.window_s, self._flush, key)
+        pending = _Pending(request, texts, loop.create_future())
+        group.items.append(pending)
+        group.tokens += sum(estimate_tokens(t) for t in texts)
+        self.requests += 1
+        if group.tokens >= self.max_batch_tokens:
+            self._flush(key)
+        return await pending.future
+
+    def _flush(self, key: tuple):
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        spawn(self._run(group), self._tasks, f"[embed-batch] {self._model_id}: batch task")
+
+    def _sub_batches(self, texts: list[str]) -> list[list[int]]:
+        """Indices sorted by length, cut into runs that fit max_batch_tokens.
+
+        Each run is padded to its own longest member, so sorting keeps
+        short texts out of batches dominated by long ones.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches, current, tokens = [], [], 0
+        for i in order:
+            n = estimate_tokens(texts[i])
+            if current and tokens + n > self.max_batch_tokens:
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += n
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _run(self, group: _Group):
+        texts = [t for p in group.items for t in p.texts]
+        template = group.items[0].request
+        started = time.monotonic()
+        try:
+            sub_batches = self._sub_batches(texts)
+            results = await asyncio.gather(*(
+                self._handler.generate_embeddings_response(
+                    template.model_copy(update={"input": [texts[i] for i in idx]})
+                )
+                for idx in sub_batches
+            ))
+            vectors: list = [None] * len(texts)
+            for idx, embeddings in zip(sub_batches, results):
+                for i, vec in zip(idx, embeddings):
+                    vectors[i] = vec
+        except Exception as e:
+            if len(group.items) > 1:
+                # don't let one bad input fail everyone it was batched with
+                logger.warning(f"[embed-batch] {self._model_id}: batched pass failed ({e}); retrying per request")
+                await asyncio.gather(*(self._run(_Group([p])) for p in group.items))
+                return
+            for p in group.items:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+
+        self.batches += len(sub_batches)
+        self.texts += len(texts)
+        if len(group.items) > 1:
+            logger.debug(
+                f"[embed-batch] {self._model_id}: {len(group.items)} requests / {len(texts)} texts "
+                f"in {len(sub_batches)} pass(es), {time.monotonic() - started:.3f}s"
+            )
+        offset = 0
+        for p in group.items:
+            if not p.future.done():
+                p.future.set_result(vectors[offset:offset + len(p.texts)])
+            offset += len(p.texts)
+
+    def snapshot(self) -> dict:
+        return {
+            "window_ms": round(self.window_s * 1000, 2),
+            "max_batch_tokens": self.max_batch_tokens,
+            "requests": self.requests,
+            "forward_passes": self.batches,
+            "texts": self.texts,
+            "requests_per_pass": round(self.requests / self.batches, 2) if self.batches else None,
+        }
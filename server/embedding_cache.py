@@ -0,0 +1,278 @@
+"""
+Content-addressed cache in front of embeddings handlers.
+Vectors are keyed by sha256(model_id + normalized input text). Lookups go
+memory LRU (byte budget) → optional disk tier (float16 memmap per model) →
+model; only the misses of a mixed batch are forwarded to the handler.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+import metrics
+
+_MB = 1024 ** 2
+# rough per-entry bookkeeping (key bytes, OrderedDict node, ndarray header)
+_ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for both the cache key and the text sent to the model."""
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def cache_key(model_id: str, text: str) -> bytes:
+    return hashlib.sha256(model_id.encode() + b"\0" + text.encode("utf-8")).digest()
+
+
+class _MemoryTier:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._entries: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is not None:
+                self._entries.move_to_end(key)
+            return vec
+
+    def put(self, key: bytes, vec: np.ndarray):
+        size = vec.nbytes + _ENTRY_OVERHEAD
+        if size > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.used_bytes -= old.nbytes + _ENTRY_OVERHEAD
+            self._entries[key] = vec
+            self.used_bytes += size
+            while self.used_bytes > self.budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.used_bytes -= evicted.nbytes + _ENTRY_OVERHEAD
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _DiskTier:
+    """Ring buffer of float16 vectors in a memmap, indexed by key in SQLite."""
+
+    def __init__(self, root: Path, max_entries: int):
+        self.root = root
+        self.max_entries = max_entries
+        self.dim: int | None = None
+        self._vectors: np.memmap | None = None
+        self._lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(root / "index.sqlite3"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS slots (key BLOB PRIMARY KEY, slot INTEGER UNIQUE)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        meta = dict(self._db.execute("SELECT k, v FROM meta"))
+        if meta.get("dim") and int(meta.get("max_entries", 0)) == max_entries:
+            self._open(int(meta["dim"]), create=False)
+        elif meta:
+            logger.info(f"[embed-cache] {root.name}: disk tier size changed, starting empty")
+            self._reset()
+        self._cursor = int(meta.get("cursor", 0)) if self._vectors is not None else 0
+
+    def _open(self, dim: int, create: bool):
+        path = self.root / "vectors.f16"
+        mode = "w+" if create or not path.exists() else "r+"
+        self._vectors = np.memmap(path, dtype=np.float16, mode=mode, shape=(self.max_entries, dim))
+        self.dim = dim
+
+    def _reset(self):
+        self._db.execute("DELETE FROM slots")
+        self._db.execute("DELETE FROM meta")
+        self._db.commit()
+        self._vectors = None
+        self.dim = None
+        (self.root / "vectors.f16").unlink(missing_ok=True)
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        if self._vectors is None or not keys:
+            return {}
+        with self._lock:
+            found = {}
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, slot FROM slots WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = np.asarray(self._vectors[slot], dtype=np.float32)
+            return found
+
+    def put_many(self, items: list[tuple[bytes, np.ndarray]]):
+        if not items:
+            return
+        with self._lock:
+            dim = items[0][1].shape[-1]
+            if self._vectors is None or self.dim != dim:
+                if self._vectors is not None:
+                    logger.info(f"[embed-cache] {self.root.name}: dimension changed {self.dim} → {dim}, resetting")
+                    self._reset()
+                self._open(dim, create=True)
+                self._cursor = 0
+            for key, vec in items:
+                slot = self._cursor
+                self._cursor = (self._cursor + 1) % self.max_entries
+                self._db.execute("DELETE FROM slots WHERE slot = ? OR key = ?", (slot, key))
+                self._db.execute("INSERT INTO slots (key, slot) VALUES (?, ?)", (key, slot))
+                self._vectors[slot] = vec.astype(np.float16)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)",
+                [("dim", str(self.dim)), ("max_entries", str(self.max_entries)), ("cursor", str(self._cursor))],
+            )
+            self._db.commit()
+            self._vectors.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class EmbeddingCache:
+    """Shared cache: one memory LRU across models, one disk tier per model."""
+
+    def __init__(
+        self,
+        memory_mb: float = 256,
+        disk_dir: str | None = None,
+        disk_max_entries: int = 500_000,
+        models: list[str] | None = None,
+    ):
+        self.memory = _MemoryTier(int(memory_mb * _MB))
+        self.disk_dir = Path(disk_dir).expanduser() if disk_dir else None
+        self.disk_max_entries = disk_max_entries
+        self.models = set(models) if models else None
+        self._disk: dict[str, _DiskTier] = {}
+
+    @classmethod
+    def from_config(cls, raw: dict | None) -> "EmbeddingCache | None":
+        """Build from the ``embedding_cache:`` block; None when disabled or absent."""
+        if not raw or not raw.get("enabled", True):
+            return None
+        return cls(
+            memory_mb=raw.get("memory_mb", 256),
+            disk_dir=raw.get("disk_dir"),
+            disk_max_entries=raw.get("disk_max_entries", 500_000),
+            models=raw.get("models"),
+        )
+
+    def applies_to(self, model_id: str, model_type: str) -> bool:
+        if model_type != "embeddings":
+            return False
+        return self.models is None or model_id in self.models
+
+    async def disk(self, model_id: str) -> _DiskTier | None:
+        """The model's disk tier, opened off the event loop on first use."""
+        if self.disk_dir is None:
+            return None
+        tier = self._disk.get(model_id)
+        if tier is None:
+            opened = await asyncio.to_thread(_DiskTier, self.disk_dir / model_id, self.disk_max_entries)
+            # a concurrent first request may have opened it meanwhile
+            tier = self._disk.setdefault(model_id, opened)
+            if tier is not opened:
+                await asyncio.to_thread(opened.close)
+        return tier
+
+    def open_disk(self, model_id: str) -> _DiskTier | None:
+        """The disk tier if it has been opened already (never touches the filesystem)."""
+        return self._disk.get(model_id)
+
+    def wrap(self, handler: Any, model_id: str) -> "CachedEmbeddingsHandler":
+        return CachedEmbeddingsHandler(handler, model_id, self)
+
+
+class CachedEmbeddingsHandler:
+    """Wraps an embeddings handler; everything except generate_embeddings_response passes through."""
+
+    def __init__(self, handler: Any, model_id: str, cache: EmbeddingCache):
+        self._handler = handler
+        self._model_id = model_id
+        self._cache = cache
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self._handler, name)
+
+    async def generate_embeddings_response(self, request):
+        texts = [request.input] if isinstance(request.input, str) else request.input
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            # token-id inputs are passed through untouched
+            self.bypassed += 1
+            metrics.EMBEDDING_CACHE_LOOKUPS.inc(model=self._model_id, result="bypass")
+            return await self._handler.generate_embeddings_response(request)
+
+        normalized = [normalize_text(t) for t in texts]
+        keys = [cache_key(self._model_id, t) for t in normalized]
+        vectors: dict[bytes, np.ndarray] = {}
+        for key in keys:
+            vec = self._cache.memory.get(key)
+            if vec is not None:
+                vectors[key] = vec
+        n_memory = len(vectors)
+
+        disk = await self._cache.disk(self._model_id)
+        if disk is not None:
+            from_disk = await asyncio.to_thread(disk.get_many, [k for k in dict.fromkeys(keys) if k not in vectors])
+            for key, vec in from_disk.items():
+                self._cache.memory.put(key, vec)
+            vectors.update(from_disk)
+        n_disk = len(vectors) - n_memory
+
+        # unique misses only: a text repeated within the batch is embedded once
+        miss_texts = {k: t for k, t in zip(keys, normalized) if k not in vectors}
+        if miss_texts:
+            sub = request.model_copy(update={"input": list(miss_texts.values())})
+            computed = await self._handler.generate_embeddings_response(sub)
+            fresh = [(k, np.asarray(v, dtype=np.float32)) for k, v in zip(miss_texts, computed)]
+            for key, vec in fresh:
+                self._cache.memory.put(key, vec)
+                vectors[key] = vec
+            if disk is not None:
+                await asyncio.to_thread(disk.put_many, fresh)
+
+        self.hits_memory += n_memory
+        self.hits_disk += n_disk
+        self.misses += len(miss_texts)
+        for result, n in (("hit_memory", n_memory), ("hit_disk", n_disk), ("miss", len(miss_texts))):
+            if n:
+                metrics.EMBEDDING_CACHE_LOOKUPS.inc(n, model=self._model_id, result=result)
+        return np.stack([vectors[k] for k in keys]).astype(np.float32, copy=False)
+
+    def cache_stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        disk = self._cache.open_disk(self._model_id)
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "bypassed_requests": self.bypassed,
+            "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else None,
+            "memory_entries": len(self._cache.memory),
+            "memory_mb": round(self._cache.memory.used_bytes / _MB, 1),
+            "memory_budget_mb": round(self._cache.memory.budget_bytes / _MB, 1),
+            "disk_entries": len(disk) if disk is not None else None,
+        }
@@ -0,0 +1,174 @@
+"""
+Virtual embeddings models that route between a small and a large model.
+The request's ``route`` field picks the target: ``bulk`` (default) goes to the
+small model, ``precision`` and ``latency_tolerant`` go to the large one.
+``latency_tolerant`` traffic is fed through a wide batching window so a
+trickle of requests becomes a few forward passes; ``precision`` is sent
+straight through. Once router traffic to a lazy large model stops for
+``large_release_s``, the router soft-unloads it instead of leaving it resident
+for its full idle_timeout. Vectors can be Matryoshka-truncated and
+L2-renormalized.
+
+The two models embed into different spaces; the response's ``model`` field
+is rewritten to the model that actually produced the vectors.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import numpy as np
+from fastapi import HTTPException
+from loguru import logger
+
+from background_tasks import spawn
+from embedding_batcher import EmbeddingBatcher
+
+ROUTES = {"bulk": "small", "precision": "large", "latency_tolerant": "large"}
+_BATCHED_ROUTES = {"latency_tolerant"}
+# request fields consumed here and never forwarded to the real model
+_ROUTER_FIELDS = {"route", "dimensions"}
+
+
+def matryoshka(vectors, dimensions: int | None) -> np.ndarray:
+    """Keep the first ``dimensions`` components and L2-renormalize each vector."""
+    arr = np.asarray(vectors, dtype=np.float32)
+    if not dimensions or arr.ndim != 2 or dimensions >= arr.shape[1]:
+        return arr
+    arr = arr[:, :dimensions]
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    return arr / np.maximum(norms, 1e-12)
+
+
+class _Target:
+    """Resolves the concrete model in the registry on every call (survives unload/reload)."""
+
+    def __init__(self, registry: Any, model_id: str):
+        self._registry = registry
+        self.model_id = model_id
+
+    async def generate_embeddings_response(self, request):
+        return await self._registry.get_handler(self.model_id).generate_embeddings_response(request)
+
+
+class EmbeddingRouter:
+    handler_type = "embeddings"
+
+    def __init__(self, state: Any, model_id: str, raw: dict):
+        self.model_id = model_id
+        self._state = state
+        self._registry = state.registry
+        self.routed = {"small": 0, "large": 0}
+        self.in_flight = 0
+        self.released = 0
+        self._large_in_flight = 0
+        self._release_timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.configure(raw)
+
+    def configure(self, raw: dict):
+        self.small = _Target(self._registry, raw["small"])
+        self.large = _Target(self._registry, raw["large"])
+        self.dimensions = raw.get("dimensions")
+        self.release_s = raw.get("large_release_s", 60)
+        self._large_batcher = EmbeddingBatcher(self.large, raw["large"], {
+            "window_ms": raw.get("large_window_ms", 500),
+            "max_batch_tokens": raw.get("large_max_batch_tokens", 4096),
+        })
+
+    # ── large-model residency ─────────────────────────────────────────────
+
+    def _schedule_release(self):
+        if not self.release_s or self._large_in_flight:
+            return
+        if self._release_timer is not None:
+            self._release_timer.cancel()
+        self._release_timer = asyncio.get_running_loop().call_later(self.release_s, self._release_large)
+
+    def _release_large(self):
+        self._release_timer = None
+        if self._large_in_flight:
+            return      # still waiting in the window; rescheduled when it finishes
+        lp_entry = getattr(self._state, "lazy_proxies", {}).get(self.large.model_id)
+        if lp_entry is None:
+            return      # eager large model: resident by configuration
+        spawn(self._unload_large(lp_entry[0]), self._tasks, f"[embed-router] {self.model_id}: releasing '{self.large.model_id}'")
+
+    async def _unload_large(self, proxy):
+        # unload_if_idle also sees direct (non-router) traffic and keeps the model if it is recent
+        if await proxy.unload_if_idle(self.release_s, soft=True):
+            self.released += 1
+            logger.info(f"[embed-router] {self.model_id}: released '{self.large.model_id}' after {self.release_s}s without traffic")
+
+    def _forwarded(self, request, target: _Target):
+        fields = {k: v for k, v in request.model_dump().items() if k not in _ROUTER_FIELDS}
+        return type(request)(**{**fields, "model": target.model_id})
+
+    async def generate_embeddings_response(self, request):
+        route = getattr(request, "route", None) or "bulk"
+        if route not in ROUTES:
+            raise HTTPException(400, f"Unknown embedding route '{route}' (expected {'|'.join(ROUTES)})")
+        size = ROUTES[route]
+        target = self.small if size == "small" else self.large
+        forward = self._large_batcher if route in _BATCHED_ROUTES else target
+
+        self.routed[size] += 1
+        self.in_flight += 1
+        if size == "large":
+            self._large_in_flight += 1
+        try:
+            vectors = await forward.generate_embeddings_response(self._forwarded(request, target))
+        finally:
+            self.in_flight -= 1
+            if size == "large":
+                self._large_in_flight -= 1
+                self._schedule_release()
+        # the endpoint builds the response from request.model after this returns
+        request.model = target.model_id
+        return matryoshka(vectors, getattr(request, "dimensions", None) or self.dimensions)
+
+    async def get_queue_stats(self) -> dict:
+        return {
+            "virtual": True,
+            "active_requests": self.in_flight,
+            "small": self.small.model_id,
+            "large": self.large.model_id,
+            "dimensions": self.dimensions,
+            "routed": dict(self.routed),
+            "large_release_s": self.release_s,
+            "large_released": self.released,
+            "large_batching": self._large_batcher.snapshot(),
+        }
+
+    async def start(self, *_):
+        pass
+
+    async def cleanup(self):
+        if self._release_timer is not None:
+            self._release_timer.cancel()
+            self._release_timer = None
+
+
+async def sync_routers(app, raw: dict):
+    """Register, reconfigure or drop virtual models to match the ``embedding_router:`` block."""
+    state = app.state
+    registry = state.registry
+    routers: dict[str, EmbeddingRouter] = getattr(state, "embedding_routers", {})
+    state.embedding_routers = routers
+
+    for model_id in [m for m in routers if m not in raw]:
+        del routers[model_id]
+        if registry.has_model(model_id):
+            await registry.unregister_model(model_id)
+
+    for model_id, entry in raw.items():
+        router = routers.get(model_id)
+        if router is not None and registry.has_model(model_id):
+            router.configure(entry)
+            continue
+        if registry.has_model(model_id):
+            logger.warning(f"[embed-router] '{model_id}' is already a real model; skipping")
+            continue
+        router = routers[model_id] = EmbeddingRouter(state, model_id, entry)
+        await registry.register_model(model_id=model_id, handler=router, model_type="embeddings")
+        logger.info(f"[embed-router] '{model_id}': bulk → {entry['small']}, precision → {entry['large']}")
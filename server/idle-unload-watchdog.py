@@ -9,9 +9,11 @@ MLX Server Idle Unload Watchdog
     python idle-unload-watchdog.py [--config config.yaml] [--watchdog-config watchdog.yaml]
 
 原理:
-    1. 每隔 check_interval 秒轮询 /v1/models/{id}/last_used（通过 middleware 注入）
-    2. 超时则 POST /v1/admin/models/{id}/unload
-    3. 收到 404 时自动 POST /v1/admin/models/{id}/load 重新加载
+    1. 每隔 check_interval 秒 GET /v1/admin/usage（一次请求拿到所有模型的
+       最后请求时间、请求计数和在途请求数，由服务端在每次请求时记录）
+    2. 超时则 POST /v1/admin/models/{id}/unload；配置了更长的 hard_timeout 时
+       先 ?mode=soft（权重保持 mmap），闲置到 hard_timeout 再 ?mode=hard
+    3. always_loaded 的模型不在 registry 时 POST /v1/admin/models/{id}/load 重新加载
 """
 
 import argparse
@@ -42,6 +44,7 @@ class ModelWatchConfig:
     model_id: str
     idle_timeout: int          # seconds, 0 = never unload
     always_loaded: bool = False
+    hard_timeout: int = 0      # > idle_timeout: soft unload first, hard unload here
 
 
 @dataclass
@@ -67,6 +70,7 @@ def load_watchdog_config(path: str) -> WatchdogConfig:
             model_id=m["model_id"],
             idle_timeout=m.get("idle_timeout", 0),
             always_loaded=m.get("always_loaded", False),
+            hard_timeout=m.get("hard_timeout", 0),
         ))
     return cfg
 
@@ -76,17 +80,30 @@ def load_watchdog_config(path: str) -> WatchdogConfig:
 # ---------------------------------------------------------------------------
 
 class ModelState:
-    def __init__(self, model_id: str, idle_timeout: int, always_loaded: bool):
+    def __init__(self, model_id: str, idle_timeout: int, always_loaded: bool, hard_timeout: int = 0):
         self.model_id = model_id
         self.idle_timeout = idle_timeout
         self.always_loaded = always_loaded
+        self.hard_timeout = hard_timeout
         self.last_used: float = time.time()
         self.loaded: bool = True   # assume loaded at start
+        self.warm: bool = False    # soft-unloaded, weights still mapped
         self.active_requests: int = 0
 
     def touch(self):
         self.last_used = time.time()
 
+    def observe(self, usage: dict[str, Any]):
+        """Apply a server-side usage record from /v1/admin/usage."""
+        self.loaded = usage.get("loaded", False)
+        self.warm = usage.get("state") == "warm"
+        self.active_requests = usage.get("in_flight", 0)
+        if self.active_requests > 0:
+            self.touch()
+        elif usage.get("idle_seconds") is not None:
+            # never move backwards past a watchdog-initiated reload
+            self.last_used = max(self.last_used, time.time() - usage["idle_seconds"])
+
     def idle_seconds(self) -> float:
         return time.time() - self.last_used
 
@@ -102,22 +119,21 @@ class AdminClient:
             headers["Authorization"] = f"Bearer {token}"
         self._client = httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30)
 
-    async def get_queue_stats(self, model_id: str) -> dict[str, Any] | None:
-        """GET /v1/admin/models/{model_id}/stats"""
+    async def get_usage(self) -> dict[str, dict[str, Any]] | None:
+        """GET /v1/admin/usage — usage records for every registered model."""
         try:
-            r = await self._client.get(f"/v1/admin/models/{model_id}/stats")
+            r = await self._client.get("/v1/admin/usage")
             if r.status_code == 200:
-                return r.json()
-            if r.status_code == 404:
-                return None   # model not loaded
+                return r.json().get("models", {})
+            log.warning(f"usage endpoint returned {r.status_code}")
         except Exception as e:
-            log.debug(f"stats error for {model_id}: {e}")
-        return {}
+            log.debug(f"usage error: {e}")
+        return None
 
-    async def unload_model(self, model_id: str) -> bool:
-        """POST /v1/admin/models/{model_id}/unload"""
+    async def unload_model(self, model_id: str, mode: str = "hard") -> bool:
+        """POST /v1/admin/models/{model_id}/unload?mode=soft|hard"""
         try:
-            r = await self._client.post(f"/v1/admin/models/{model_id}/unload")
+            r = await self._client.post(f"/v1/admin/models/{model_id}/unload", params={"mode": mode})
             return r.status_code == 200
         except Exception as e:
             log.error(f"unload error for {model_id}: {e}")
@@ -132,17 +148,6 @@ class AdminClient:
             log.error(f"load error for {model_id}: {e}")
             return False
 
-    async def list_loaded_models(self) -> list[str]:
-        """GET /v1/models"""
-        try:
-            r = await self._client.get("/v1/models")
-            if r.status_code == 200:
-                data = r.json()
-                return [m["id"] for m in data.get("data", [])]
-        except Exception as e:
-            log.debug(f"list models error: {e}")
-        return []
-
     async def aclose(self):
         await self._client.aclose()
 
@@ -156,7 +161,7 @@ class IdleUnloadWatchdog:
         self.cfg = cfg
         self.client = AdminClient(cfg.base_url, cfg.admin_token)
         self.states: dict[str, ModelState] = {
-            m.model_id: ModelState(m.model_id, m.idle_timeout, m.always_loaded)
+            m.model_id: ModelState(m.model_id, m.idle_timeout, m.always_loaded, m.hard_timeout)
             for m in cfg.models
         }
 
@@ -173,15 +178,23 @@ class IdleUnloadWatchdog:
             await asyncio.sleep(self.cfg.check_interval)
 
     async def _check_all(self):
-        # 先获取当前已加载的模型列表
-        loaded = set(await self.client.list_loaded_models())
+        # 一次请求获取所有模型的使用记录
+        usage = await self.client.get_usage()
+        if usage is None:
+            log.warning("usage unavailable, skipping this check")
+            return
 
         for model_id, state in self.states.items():
-            state.loaded = model_id in loaded
+            record = usage.get(model_id)
+            if record is None:
+                # 不在 registry 里（已被 admin unload）
+                state.loaded = False
+            else:
+                state.observe(record)
 
             if state.always_loaded:
                 # 确保 always_loaded 的模型始终在线
-                if not state.loaded:
+                if record is None:
                     log.info(f"[{model_id}] always_loaded=true, reloading...")
                     ok = await self.client.load_model(model_id)
                     if ok:
@@ -193,34 +206,41 @@ class IdleUnloadWatchdog:
             if state.idle_timeout <= 0:
                 continue  # 不管理这个模型
 
-            if not state.loaded:
-                # 已经 unload，不需要处理
-                log.debug(f"[{model_id}] already unloaded, skipping")
+            if state.warm:
+                if state.hard_timeout <= state.idle_timeout:
+                    # 未配置 hard_timeout：warm 权重交给服务端的 warm_timeout 释放
+                    continue
+                # soft unload 后继续闲置到 hard_timeout 再彻底释放
+                idle = state.idle_seconds()
+                if idle >= state.hard_timeout:
+                    log.info(f"[{model_id}] idle {idle:.0f}s >= {state.hard_timeout}s, hard unloading...")
+                    if await self.client.unload_model(model_id, mode="hard"):
+                        state.warm = False
+                        state.loaded = False
+                        log.info(f"[{model_id}] hard unloaded ✓ (weights released)")
                 continue
 
-            # 查询活跃请求数
-            stats = await self.client.get_queue_stats(model_id)
-            if stats is None:
-                # 404 = 已经不在 registry 里了
-                state.loaded = False
-                log.info(f"[{model_id}] not found in registry (already unloaded)")
+            if not state.loaded:
+                # 已经 unload（或 lazy 模型尚未加载），不需要处理
+                log.debug(f"[{model_id}] not loaded, skipping")
                 continue
 
-            active = stats.get("queue_stats", {}).get("active_requests", 0)
-            if active > 0:
-                state.touch()
-                log.debug(f"[{model_id}] active_requests={active}, resetting idle timer")
+            if state.active_requests > 0:
+                log.debug(f"[{model_id}] in_flight={state.active_requests}, resetting idle timer")
                 continue
 
             idle = state.idle_seconds()
             log.debug(f"[{model_id}] idle={idle:.0f}s / timeout={state.idle_timeout}s")
 
             if idle >= state.idle_timeout:
-                log.info(f"[{model_id}] idle {idle:.0f}s >= {state.idle_timeout}s, unloading...")
-                ok = await self.client.unload_model(model_id)
+                # hard_timeout 更长时先 soft unload：释放 KV cache，权重保持 page cache 常驻
+                mode = "soft" if state.hard_timeout > state.idle_timeout else "hard"
+                log.info(f"[{model_id}] idle {idle:.0f}s >= {state.idle_timeout}s, {mode} unloading...")
+                ok = await self.client.unload_model(model_id, mode=mode)
                 if ok:
                     state.loaded = False
-                    log.info(f"[{model_id}] unloaded ✓ (freed memory)")
+                    state.warm = mode == "soft"
+                    log.info(f"[{model_id}] {mode} unloaded ✓ (freed memory)")
                 else:
                     log.warning(f"[{model_id}] unload failed")
 
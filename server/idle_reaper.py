@@ -0,0 +1,78 @@
+"""
+In-process idle reaper for LazyHandlerProxy.
+Unloads lazy models once they have been idle longer than the idle_timeout
+from config.yaml, without a second daemon or any HTTP polling. Models with a
+warm_timeout are soft-unloaded first and have their weights released later.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from loguru import logger
+
+_MIN_SLEEP = 0.5
+_MAX_SLEEP = 1.0
+
+
+class IdleReaper:
+    """Background task that sleeps until the next lazy model is due to expire."""
+
+    def __init__(self, lazy_proxies: dict[str, tuple]):
+        # Shared with app.state.lazy_proxies; admin load/unload mutate it in place
+        self._lazy_proxies = lazy_proxies
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="idle-reaper")
+            logger.info(f"[reaper] Watching {len(self._lazy_proxies)} lazy model(s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                delay = await self._reap()
+            except Exception as e:
+                logger.error(f"[reaper] check failed: {e}")
+                delay = _MAX_SLEEP
+            await asyncio.sleep(delay)
+
+    async def _reap(self) -> float:
+        """Step expired models down (loaded → warm → unloaded); return seconds until the next is due."""
+        next_due = _MAX_SLEEP
+        for model_id, (handler, idle_timeout) in list(self._lazy_proxies.items()):
+            warm_timeout = handler.warm_timeout
+            if handler.is_warm() and not handler.is_loaded():
+                if warm_timeout <= 0:
+                    continue
+                remaining = warm_timeout - handler.warm_seconds()
+                if remaining > 0:
+                    next_due = min(next_due, remaining)
+                    continue
+                handler.release_warm()
+                logger.info(f"[reaper] '{model_id}' warm {warm_timeout}s elapsed, weights released ✓")
+                continue
+
+            if idle_timeout <= 0 or not handler.is_loaded():
+                continue
+            if handler.in_flight > 0:
+                continue
+            remaining = idle_timeout - handler.idle_seconds()
+            if remaining > 0:
+                next_due = min(next_due, remaining)
+                continue
+            idle = handler.idle_seconds()
+            soft = warm_timeout > 0
+            if await handler.unload_if_idle(idle_timeout, soft=soft):
+                mode = "soft-unloaded (weights kept warm)" if soft else "unloaded"
+                logger.info(f"[reaper] '{model_id}' idle {idle:.0f}s >= {idle_timeout}s, {mode} ✓")
+        return max(_MIN_SLEEP, next_due)
@@ -5,11 +5,21 @@ Model subprocess is only spawned on first request, not at server startup.
 from __future__ import annotations
 
 import asyncio
+import math
 import time
 from typing import Any
 
+from fastapi import HTTPException
+
 from app.core.handler_process import HandlerProcessProxy
 
+import metrics
+from memory_scheduler import process_rss_bytes
+from warm_standby import WeightPin
+
+# Retry-After hint before any load of this model has been timed
+_DEFAULT_LOAD_ESTIMATE = 30.0
+
 
 class LazyHandlerProxy:
     """Wraps HandlerProcessProxy — defers start() until first request."""
@@ -19,7 +29,22 @@ class LazyHandlerProxy:
         self._queue_config = queue_config
         self._started = False
         self._lock = asyncio.Lock()
+        self.model_id: str = proxy.model_id
         self.last_request_time: float = 0.0
+        self.loaded_at: float = 0.0
+        self.request_count: int = 0
+        self.in_flight: int = 0
+        # Soft unload keeps weights page-cache-resident; released after warm_timeout
+        self.warm_timeout: float = 0
+        self._warm: WeightPin | None = None
+        # Cold-start admission state
+        self.last_load_seconds: float | None = None
+        self._loading_since: float | None = None
+        self._waiting: int = 0
+        # Optional MemoryScheduler; set by start_with_admin when a budget is configured
+        self.scheduler = None
+        # Optional arrival callback (Preloader.record); fires before any cold start
+        self.on_request = None
         # Save factory params so we can rebuild the proxy after cleanup
         self._proxy_factory = {
             "model_cfg_dict": proxy._model_cfg_dict,
@@ -29,54 +54,227 @@ class LazyHandlerProxy:
         }
 
     async def _ensure_started(self):
+        """Admit the caller to the cold-start queue and load the model if needed.
+
+        While a load is in progress the model's queue_size and queue_timeout
+        apply: callers beyond queue_size, or still waiting after queue_timeout,
+        get a 503 with a Retry-After based on the last measured load time.
+        """
         if self._started:
             return
-        async with self._lock:
+        entered = time.monotonic()
+        queue_size = self._queue_config.get("queue_size") or 0
+        if queue_size and self._waiting >= queue_size:
+            raise self._unavailable(f"loading, queue full ({self._waiting} waiting)")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._lock.acquire(), self._queue_config.get("timeout") or None)
+        except asyncio.TimeoutError:
+            raise self._unavailable("timed out waiting for model to load")
+        finally:
+            self._waiting -= 1
+
+        try:
             if not self._started:
-                await self._proxy.start(self._queue_config)
-                self._started = True
+                await self._load_locked()
+        finally:
+            self._lock.release()
+        metrics.QUEUE_WAIT_SECONDS.observe(time.monotonic() - entered, model=self.model_id)
+
+    async def _load_locked(self):
+        self._loading_since = time.monotonic()
+        try:
+            if self.scheduler is not None:
+                await self.scheduler.make_room(self.model_id)
+            await self._proxy.start(self._queue_config)
+            self._started = True
+            self.loaded_at = time.monotonic()
+            self.last_load_seconds = self.loaded_at - self._loading_since
+        except BaseException:
+            if self.scheduler is not None:
+                self.scheduler.release_reservation(self.model_id)
+            raise
+        finally:
+            self._loading_since = None
+        warm = self._warm is not None
+        # the subprocess now holds its own copy of the weights
+        self.release_warm()
+        metrics.LOADS.inc(model=self.model_id)
+        metrics.COLD_START_SECONDS.observe(
+            self.last_load_seconds, model=self.model_id, source="warm" if warm else "cold"
+        )
+        rss = await asyncio.to_thread(process_rss_bytes, self)
+        if rss:
+            metrics.RSS_AFTER_LOAD_BYTES.observe(rss, model=self.model_id)
+        if self.scheduler is not None:
+            self.scheduler.mark_loaded(self.model_id, self, evictable=True, rss=rss)
+
+    def _estimated_load_remaining(self) -> float:
+        estimate = self.last_load_seconds or _DEFAULT_LOAD_ESTIMATE
+        if self._loading_since is not None:
+            estimate -= time.monotonic() - self._loading_since
+        return max(1.0, estimate)
+
+    def _unavailable(self, reason: str) -> HTTPException:
+        retry_after = math.ceil(self._estimated_load_remaining())
+        return HTTPException(
+            503,
+            f"Model '{self.model_id}' {reason}; retry in ~{retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
 
     def is_loaded(self) -> bool:
         return self._started
 
-    async def unload(self):
+    def is_transitioning(self) -> bool:
+        """True while a load or unload holds the lock (or a caller is queued for it)."""
+        return self._lock.locked()
+
+    def is_warm(self) -> bool:
+        return self._warm is not None
+
+    def state(self) -> str:
+        if self._started:
+            return "loaded"
+        return "warm" if self._warm is not None else "unloaded"
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - max(self.last_request_time, self.loaded_at)
+
+    def warm_seconds(self) -> float:
+        return self._warm.warm_seconds() if self._warm is not None else 0.0
+
+    def warm_bytes(self) -> int:
+        return self._warm.nbytes if self._warm is not None else 0
+
+    async def unload(self, soft: bool = False):
+        """Stop the subprocess. ``soft`` keeps the weight files mapped for a fast reload."""
         async with self._lock:
-            if not self._started:
-                return
-            await self._proxy.cleanup()
-            self._started = False
-            # HandlerProcessProxy is single-use after cleanup; rebuild it
-            self._proxy = HandlerProcessProxy(**self._proxy_factory)
+            await self._unload_locked(soft)
+
+    async def unload_if_idle(self, idle_timeout: float, soft: bool = False) -> bool:
+        """Unload only if still idle once the lock is held; returns True if unloaded."""
+        async with self._lock:
+            if not self._started or self.in_flight > 0 or self.idle_seconds() < idle_timeout:
+                return False
+            await self._unload_locked(soft)
+            return True
+
+    def release_warm(self):
+        if self._warm is not None:
+            self._warm.release()
+            self._warm = None
+
+    async def _unload_locked(self, soft: bool = False):
+        if not soft:
+            self.release_warm()
+        if not self._started:
+            return
+        # Flip first so requests arriving mid-cleanup queue on the lock and reload
+        self._started = False
+        if soft:
+            # map before killing the subprocess so the pages never leave the cache
+            self._warm = await asyncio.to_thread(WeightPin, self._proxy_factory["model_path"])
+        await self._proxy.cleanup()
+        metrics.UNLOADS.inc(model=self.model_id, mode="soft" if soft else "hard")
+        if self.scheduler is not None:
+            self.scheduler.mark_unloaded(self.model_id)
+            if soft:
+                self.scheduler.mark_warm(self.model_id, self)
+        # HandlerProcessProxy is single-use after cleanup; rebuild it
+        self._proxy = HandlerProcessProxy(**self._proxy_factory)
+
+    async def cleanup(self):
+        # Registry teardown calls cleanup(); never spawn a subprocess just to kill it
+        await self.unload()
+
+    async def get_queue_stats(self) -> dict:
+        # Introspection must neither load the model nor count as a request
+        if not self._started:
+            stats = {
+                "loaded": False,
+                "state": self.state(),
+                "active_requests": 0,
+                "queue_size": self._waiting,
+                "max_queue_size": self._queue_config.get("queue_size"),
+                "max_concurrency": self._queue_config.get("max_concurrency"),
+                "last_load_seconds": self.last_load_seconds,
+            }
+            if self._loading_since is not None:
+                stats.update(
+                    state="loading",
+                    # the next arrival would queue at this position
+                    position=self._waiting + 1,
+                    load_elapsed=round(time.monotonic() - self._loading_since, 1),
+                    estimated_remaining=round(self._estimated_load_remaining(), 1),
+                )
+            return stats
+        stats = await self._proxy.get_queue_stats()
+        # the subprocess's stats don't carry the configured limits
+        return {
+            "max_queue_size": self._queue_config.get("queue_size"),
+            "max_concurrency": self._queue_config.get("max_concurrency"),
+            **stats,
+        }
+
+    def usage(self) -> dict:
+        """Push-tracked usage: updated on every request, not sampled."""
+        idle = time.monotonic() - self.last_request_time if self.last_request_time else None
+        return {
+            "loaded": self._started,
+            "state": self.state(),
+            "request_count": self.request_count,
+            "in_flight": self.in_flight,
+            "last_request_at": time.time() - idle if idle is not None else None,
+            "idle_seconds": idle,
+        }
 
     # ── delegate all handler methods ──────────────────────────────────────
 
+    async def _begin_request(self):
+        if self.on_request is not None:
+            self.on_request(self.model_id)
+        await self._ensure_started()
+        self.last_request_time = time.monotonic()
+        self.request_count += 1
+        self.in_flight += 1
+
+    def _end_request(self):
+        self.in_flight -= 1
+        self.last_request_time = time.monotonic()
+
     def __getattr__(self, name: str):
         attr = getattr(self._proxy, name)
         if not asyncio.iscoroutinefunction(attr):
             return attr
 
         async def wrapper(*args, **kwargs):
-            await self._ensure_started()
-            self.last_request_time = time.monotonic()
-            return await attr(*args, **kwargs)
+            await self._begin_request()
+            try:
+                return await metrics.observe_call(self.model_id, getattr(self._proxy, name)(*args, **kwargs))
+            finally:
+                self._end_request()
 
         return wrapper
 
+    async def _stream(self, method: str, *a, **kw):
+        await self._begin_request()
+        try:
+            async for chunk in metrics.observe_stream(self.model_id, getattr(self._proxy, method)(*a, **kw)):
+                yield chunk
+        finally:
+            self._end_request()
+
     # async generators need special handling
     async def generate_text_stream(self, *a, **kw):
-        await self._ensure_started()
-        self.last_request_time = time.monotonic()
-        async for chunk in self._proxy.generate_text_stream(*a, **kw):
+        async for chunk in self._stream("generate_text_stream", *a, **kw):
             yield chunk
 
     async def generate_multimodal_stream(self, *a, **kw):
-        await self._ensure_started()
-        self.last_request_time = time.monotonic()
-        async for chunk in self._proxy.generate_multimodal_stream(*a, **kw):
+        async for chunk in self._stream("generate_multimodal_stream", *a, **kw):
             yield chunk
 
     async def generate_transcription_stream_from_data(self, *a, **kw):
-        await self._ensure_started()
-        self.last_request_time = time.monotonic()
-        async for chunk in self._proxy.generate_transcription_stream_from_data(*a, **kw):
+        async for chunk in self._stream("generate_transcription_stream_from_data", *a, **kw):
             yield chunk
@@ -0,0 +1,250 @@
+"""
+Memory-budget-aware model scheduler.
+Before a model subprocess is spawned, evicts idle lazy models (LRU or by
+priority) until the new model's footprint fits inside the configured budget.
+"""
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+
+import metrics
+
+_GB = 1024 ** 3
+
+
+@dataclass
+class _Resident:
+    model_id: str
+    handler: Any            # LazyHandlerProxy (evictable) or HandlerProcessProxy
+    evictable: bool
+    loaded_at: float        # time.monotonic()
+
+
+def process_rss_bytes(proxy: Any) -> int:
+    """Best-effort RSS of a HandlerProcessProxy's model subprocess (0 if unknown)."""
+    proc = getattr(proxy, "_proxy", proxy)          # unwrap LazyHandlerProxy
+    proc = getattr(proc, "_process", None) or getattr(proc, "process", None)
+    pid = getattr(proc, "pid", None)
+    if not pid:
+        return 0
+    try:
+        out = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(pid)],
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+        return int(out) * 1024 if out else 0
+    except Exception:
+        return 0
+
+
+class MemoryScheduler:
+    """Tracks resident models and makes room for new loads within a memory budget.
+
+    Footprints come from the ``memory:`` block in config.yaml; models without a
+    configured footprint use the RSS measured after their last load, falling
+    back to ``default_footprint_gb``.
+    """
+
+    def __init__(
+        self,
+        budget_gb: float,
+        policy: str = "lru",
+        default_footprint_gb: float = 4.0,
+        models: dict[str, dict] | None = None,
+    ):
+        self._measured: dict[str, int] = {}
+        self._resident: dict[str, _Resident] = {}
+        # footprints of loads admitted by make_room whose subprocess isn't up yet
+        self._reserved: dict[str, int] = {}
+        # soft-unloaded LazyHandlerProxies whose weights are still pinned in page cache
+        self._warm: dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        self.configure({
+            "budget_gb": budget_gb,
+            "policy": policy,
+            "default_footprint_gb": default_footprint_gb,
+            "models": models,
+        })
+
+    @classmethod
+    def from_config(cls, raw: dict | None) -> "MemoryScheduler | None":
+        """Build from the ``memory:`` block; None when no budget is configured."""
+        if not raw or not raw.get("budget_gb"):
+            return None
+        return cls(
+            budget_gb=raw["budget_gb"],
+            policy=raw.get("policy", "lru"),
+            default_footprint_gb=raw.get("default_footprint_gb", 4.0),
+            models=raw.get("models") or {},
+        )
+
+    def configure(self, raw: dict):
+        """(Re)apply a ``memory:`` block; residency and measured RSS are kept."""
+        if not raw.get("budget_gb"):
+            logger.warning("[memory] budget_gb missing from config; keeping current settings")
+            return
+        policy = raw.get("policy", "lru")
+        if policy not in ("lru", "priority"):
+            raise ValueError(f"Unknown memory policy '{policy}' (expected lru|priority)")
+        self.budget_bytes = int(raw["budget_gb"] * _GB)
+        self.policy = policy
+        self.default_footprint_bytes = int(raw.get("default_footprint_gb", 4.0) * _GB)
+        models = raw.get("models") or {}
+        self._configured: dict[str, int] = {
+            mid: int(m["footprint_gb"] * _GB)
+            for mid, m in models.items() if m.get("footprint_gb")
+        }
+        self._priority: dict[str, int] = {mid: m.get("priority", 0) for mid, m in models.items()}
+
+    # ── accounting ────────────────────────────────────────────────────────
+
+    def footprint(self, model_id: str) -> int:
+        if model_id in self._configured:
+            return self._configured[model_id]
+        return self._measured.get(model_id, self.default_footprint_bytes)
+
+    def warm_bytes(self, exclude: str | None = None) -> int:
+        for mid in [m for m, h in self._warm.items() if not h.is_warm()]:
+            del self._warm[mid]     # pin released elsewhere (reload, reaper, hard unload)
+        return sum(h.warm_bytes() for mid, h in self._warm.items() if mid != exclude)
+
+    def used_bytes(self, exclude: str | None = None) -> int:
+        """Resident models, loads in progress and pinned warm weights.
+
+        ``exclude``'s own warm pin is not counted: it is released as soon as
+        that model's subprocess has loaded from it.
+        """
+        resident = sum(self.footprint(mid) for mid in self._resident)
+        reserved = sum(b for mid, b in self._reserved.items() if mid not in self._resident)
+        return resident + reserved + self.warm_bytes(exclude)
+
+    def try_reserve(self, model_id: str) -> bool:
+        """Reserve ``model_id``'s footprint only if it fits without evicting anything.
+
+        Never awaits, so the check and the reservation are atomic on the event
+        loop. make_room keeps the reservation rather than evicting for it.
+        False if the model is already resident or being loaded.
+        """
+        if model_id in self._resident or model_id in self._reserved:
+            return False
+        need = self.footprint(model_id)
+        if self.used_bytes(model_id) + need > self.budget_bytes:
+            return False
+        self._reserved[model_id] = need
+        return True
+
+    def mark_loaded(self, model_id: str, handler: Any, evictable: bool, rss: int = 0):
+        """``rss`` is the caller's post-load measurement (process_rss_bytes, run off the loop)."""
+        self._reserved.pop(model_id, None)
+        self._resident[model_id] = _Resident(model_id, handler, evictable, time.monotonic())
+        if rss:
+            self._measured[model_id] = rss
+        logger.info(
+            f"[memory] '{model_id}' resident "
+            f"(footprint={self.footprint(model_id) / _GB:.1f}GB, "
+            f"used={self.used_bytes() / _GB:.1f}/{self.budget_bytes / _GB:.1f}GB)"
+        )
+
+    def mark_unloaded(self, model_id: str):
+        self._resident.pop(model_id, None)
+
+    def mark_warm(self, model_id: str, handler: Any):
+        self._warm[model_id] = handler
+
+    def release_reservation(self, model_id: str):
+        """Drop the reservation of a load that failed before mark_loaded."""
+        self._reserved.pop(model_id, None)
+
+    # ── eviction ──────────────────────────────────────────────────────────
+
+    def _last_used(self, r: _Resident) -> float:
+        return max(getattr(r.handler, "last_request_time", 0.0), r.loaded_at)
+
+    def _candidates(self, exclude: str, skip: set[str]) -> list[_Resident]:
+        # a handler mid-load/unload is not a candidate: waiting on its lock could wait on us
+        cands = [
+            r for r in self._resident.values()
+            if r.evictable and r.model_id != exclude and r.model_id not in skip
+            and r.handler.is_loaded() and not r.handler.is_transitioning()
+            and getattr(r.handler, "in_flight", 0) == 0
+        ]
+        if self.policy == "priority":
+            cands.sort(key=lambda r: (self._priority.get(r.model_id, 0), self._last_used(r)))
+        else:
+            cands.sort(key=self._last_used)
+        return cands
+
+    def _release_warm_for(self, model_id: str, need: int):
+        """Warm pins are only page cache: drop them (oldest first) before evicting loaded models."""
+        for mid, handler in sorted(self._warm.items(), key=lambda kv: -kv[1].warm_seconds()):
+            if self.used_bytes(model_id) + need <= self.budget_bytes:
+                break
+            if mid != model_id and handler.is_warm():
+                logger.info(f"[memory] releasing warm weights of '{mid}' ({handler.warm_bytes() / _GB:.1f}GB) to load '{model_id}'")
+                handler.release_warm()
+
+    async def make_room(self, model_id: str):
+        """Evict idle lazy models until ``model_id`` fits, then reserve its footprint.
+
+        The reservation counts against the budget until ``mark_loaded`` (or
+        ``release_reservation`` if the load fails), so concurrent cold starts
+        cannot both squeeze into the same free space. The fit check and the
+        reservation happen under the scheduler lock; evictions run outside it,
+        because a victim's lock may be held by a load that is itself waiting
+        here.
+        """
+        if model_id in self._reserved:
+            return      # admitted by try_reserve: room was already there
+        need = self.footprint(model_id)
+        skip: set[str] = set()
+        while True:
+            async with self._lock:
+                self._reserved.pop(model_id, None)
+                self._release_warm_for(model_id, need)
+                # residency and in_flight may have changed during the last eviction
+                candidates = []
+                if self.used_bytes(model_id) + need > self.budget_bytes:
+                    candidates = self._candidates(exclude=model_id, skip=skip)
+                if not candidates:
+                    self._reserved[model_id] = need
+                    if self.used_bytes(model_id) > self.budget_bytes:
+                        logger.warning(
+                            f"[memory] loading '{model_id}' exceeds budget "
+                            f"({self.used_bytes(model_id) / _GB:.1f}/{self.budget_bytes / _GB:.1f}GB); "
+                            f"no idle models left to evict"
+                        )
+                    return
+                victim = candidates[0]
+            # unload_if_idle re-checks in_flight under the handler's own lock
+            if not await victim.handler.unload_if_idle(0):
+                skip.add(victim.model_id)
+                continue
+            logger.info(
+                f"[memory] evicted '{victim.model_id}' "
+                f"({self.footprint(victim.model_id) / _GB:.1f}GB) to load '{model_id}'"
+            )
+            self.mark_unloaded(victim.model_id)
+            metrics.EVICTIONS.inc(model=victim.model_id)
+
+    def snapshot(self) -> dict:
+        return {
+            "budget_gb": round(self.budget_bytes / _GB, 2),
+            "used_gb": round(self.used_bytes() / _GB, 2),
+            "policy": self.policy,
+            "loading": {mid: round(b / _GB, 2) for mid, b in self._reserved.items()},
+            "warm": {mid: round(h.warm_bytes() / _GB, 2) for mid, h in self._warm.items() if h.is_warm()},
+            "resident": {
+                mid: {
+                    "footprint_gb": round(self.footprint(mid) / _GB, 2),
+                    "evictable": r.evictable,
+                    "priority": self._priority.get(mid, 0),
+                }
+                for mid, r in self._resident.items()
+            },
+        }
@@ -0,0 +1,184 @@
+"""
+Prometheus-style metrics for model lifecycle and request latency.
+Served as text exposition format on GET /metrics; no client library needed.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from loguru import logger
+
+_GB = 1024 ** 3
+
+
+def _fmt_labels(labels: tuple[tuple[str, str], ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return "+Inf" if v == float("inf") else repr(float(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(key)} {_fmt_value(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            row[idx] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                cumulative = 0.0
+                for le, n in zip(self.buckets, row):
+                    cumulative += n
+                    lines.append(
+                        f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_value(le)),))} {_fmt_value(cumulative)}"
+                    )
+                lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(row[-2])}")
+                lines.append(f"{self.name}_count{_fmt_labels(key)} {_fmt_value(row[-1])}")
+        return lines
+
+
+COLD_START_SECONDS = Histogram(
+    "mlx_model_cold_start_seconds", "Time to spawn a model subprocess and load weights",
+    (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "mlx_cold_start_queue_wait_seconds", "Time a request waited for its model to finish loading",
+    (0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+TTFT_SECONDS = Histogram(
+    "mlx_time_to_first_token_seconds", "Time from request start to first streamed chunk",
+    (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+TOKENS_PER_SECOND = Histogram(
+    "mlx_stream_tokens_per_second",
+    "Generation rate: mode=stream is decode after the first chunk (one chunk counted as one token), "
+    "mode=response is usage.completion_tokens over total latency of a non-streaming call",
+    (1, 5, 10, 20, 40, 60, 80, 120, 160, 240),
+)
+REQUEST_SECONDS = Histogram(
+    "mlx_request_seconds", "Total handler time per request, streaming or not (after any cold start)",
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120),
+)
+RSS_AFTER_LOAD_BYTES = Histogram(
+    "mlx_model_rss_after_load_bytes", "Resident set size of the model subprocess right after load",
+    tuple(g * _GB for g in (0.5, 1, 2, 4, 8, 12, 16, 20, 24, 32)),
+)
+LOADS = Counter("mlx_model_loads_total", "Model loads")
+UNLOADS = Counter("mlx_model_unloads_total", "Model unloads by mode (soft|hard)")
+EVICTIONS = Counter("mlx_model_evictions_total", "Models evicted by the memory scheduler")
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "mlx_embedding_cache_lookups_total", "Embedding cache lookups by result (hit_memory|hit_disk|miss|bypass)"
+)
+
+_ALL = (
+    COLD_START_SECONDS, QUEUE_WAIT_SECONDS, TTFT_SECONDS, TOKENS_PER_SECOND, REQUEST_SECONDS,
+    RSS_AFTER_LOAD_BYTES, LOADS, UNLOADS, EVICTIONS, EMBEDDING_CACHE_LOOKUPS,
+)
+
+
+# ── request instrumentation (shared by lazy and eager handler wrappers) ──
+
+def _completion_tokens(result: Any) -> int | None:
+    usage = result.get("usage") if isinstance(result, dict) else getattr(result, "usage", None)
+    if isinstance(usage, dict):
+        return usage.get("completion_tokens")
+    return getattr(usage, "completion_tokens", None)
+
+
+async def observe_call(model_id: str, call) -> Any:
+    """Await a non-streaming handler call, recording latency and tokens/sec from its usage."""
+    started = time.monotonic()
+    result = await call
+    elapsed = time.monotonic() - started
+    REQUEST_SECONDS.observe(elapsed, model=model_id)
+    tokens = _completion_tokens(result)
+    if tokens and elapsed > 0:
+        TOKENS_PER_SECOND.observe(tokens / elapsed, model=model_id, mode="response")
+    return result
+
+
+async def observe_stream(model_id: str, stream: AsyncIterator) -> AsyncIterator:
+    """Re-yield a handler stream, recording TTFT, decode rate and total latency."""
+    started = time.monotonic()
+    first = None
+    chunks = 0
+    try:
+        async for chunk in stream:
+            if first is None:
+                first = time.monotonic()
+                TTFT_SECONDS.observe(first - started, model=model_id)
+            chunks += 1
+            yield chunk
+    finally:
+        REQUEST_SECONDS.observe(time.monotonic() - started, model=model_id)
+        if first is not None and chunks > 1:
+            elapsed = time.monotonic() - first
+            if elapsed > 0:
+                TOKENS_PER_SECOND.observe((chunks - 1) / elapsed, model=model_id, mode="stream")
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in _ALL:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+metrics_router = APIRouter(tags=["metrics"])
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+def install(app):
+    app.include_router(metrics_router)
+    logger.info("Metrics installed: /metrics")
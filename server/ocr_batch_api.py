@@ -0,0 +1,269 @@
+"""
+Batch OCR endpoint for PaddleOCR-VL.
+One multipart upload of images and/or PDFs becomes a stream of per-page
+results, instead of one /chat/completions round trip per page.
+
+    POST /v1/ocr/batch   (multipart: files=..., model, max_tokens, dpi, max_side)
+        → application/x-ndjson, one line per page as it finishes, then a summary line
+
+Pages are rendered/decoded/resized in a thread pool and written as PNGs to a
+per-batch temp dir; the model subprocess reads them by path (same host), so
+no page is base64-encoded. At most the model's max_concurrency pages are in
+the model at once, with the same number decoded ahead.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from PIL import Image, ImageOps
+
+from app.schemas.openai import ChatCompletionRequest
+
+from request_handlers import release_handler, resolve_handler
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # fall back to poppler's pdftoppm
+    pdfium = None
+
+DEFAULT_MODEL = "paddleocr-vl-6bit"
+OCR_PROMPT = "OCR:"                 # PaddleOCR-VL expects exactly this prompt
+DEFAULT_DPI = 150
+DEFAULT_MAX_SIDE = 2048
+DECODE_WORKERS = 4
+SPOOL_CHUNK = 1 << 20
+
+ocr_router = APIRouter(prefix="/v1/ocr", tags=["ocr"])
+_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="ocr-decode")
+# pdfium is not thread-safe, even across documents; pdftoppm runs one process per page instead
+_pdfium_lock = threading.Lock()
+
+
+def _messages(image_path: str) -> list[dict]:
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "image_url", "image_url": {"url": image_path}},
+            {"type": "text", "text": OCR_PROMPT},
+        ],
+    }]
+
+
+def _save_page(image: Image.Image, out: Path, max_side: int) -> str:
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        # transparent regions become white, not black
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.split()[3])
+        image = background
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    image.save(out, "PNG")
+    return str(out)
+
+
+def _decode_image(path: Path, out: Path, max_side: int) -> str:
+    with Image.open(path) as image:
+        return _save_page(image, out, max_side)
+
+
+class _PdfDocument:
+    """One open pdfium document per upload, shared by all of its page renders."""
+
+    def __init__(self, path: Path):
+        with _pdfium_lock:
+            self._doc = pdfium.PdfDocument(str(path))
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._doc)
+
+    def render(self, page: int, out: Path, dpi: int, max_side: int) -> str:
+        """Render 1-based ``page``."""
+        with _pdfium_lock:
+            if self._closed:
+                raise RuntimeError("batch cancelled")
+            pdf_page = self._doc[page - 1]
+            try:
+                image = pdf_page.render(scale=dpi / 72).to_pil()
+            finally:
+                pdf_page.close()
+        return _save_page(image, out, max_side)
+
+    def close(self):
+        with _pdfium_lock:
+            if not self._closed:
+                self._closed = True
+                self._doc.close()
+
+
+def _pdftoppm_page_count(pdf: Path) -> int:
+    info = subprocess.run(["pdfinfo", str(pdf)], capture_output=True, text=True, check=True).stdout
+    for line in info.splitlines():
+        if line.startswith("Pages:"):
+            return int(line.split()[1])
+    raise ValueError(f"pdfinfo reported no page count for {pdf.name}")
+
+
+def _pdftoppm_render(pdf: Path, page: int, out: Path, dpi: int, max_side: int) -> str:
+    """Render 1-based ``page``."""
+    prefix = out.with_suffix("")
+    subprocess.run(
+        ["pdftoppm", "-r", str(dpi), "-f", str(page), "-l", str(page), "-png", "-singlefile",
+         str(pdf), str(prefix)],
+        capture_output=True, check=True,
+    )
+    with Image.open(prefix.with_suffix(".png")) as image:
+        image.load()
+    return _save_page(image, out, max_side)
+
+
+async def _spool(upload: UploadFile, dest: Path) -> bytes:
+    """Copy an upload to ``dest`` chunk by chunk; returns its first bytes for type sniffing."""
+    head = b""
+    with dest.open("wb") as f:
+        while chunk := await upload.read(SPOOL_CHUNK):
+            if not head:
+                head = chunk[:8]
+            await asyncio.to_thread(f.write, chunk)
+    return head
+
+
+async def _expand(
+    files: list[UploadFile], work: Path, dpi: int, max_side: int, docs: list[_PdfDocument],
+) -> list[tuple[str, int, Callable[[], str]]]:
+    """One (source name, 1-based page, prepare-callable) per page, in upload order.
+
+    Uploads are spooled to ``work`` rather than held in memory; each PDF is
+    opened once and appended to ``docs`` for the caller to close.
+    """
+    pages = []
+    for n, upload in enumerate(files):
+        name = upload.filename or f"file{n}"
+        path = work / f"{n}.upload"
+        head = await _spool(upload, path)
+        if head.startswith(b"%PDF-"):
+            if pdfium is not None:
+                doc = await asyncio.to_thread(_PdfDocument, path)
+                docs.append(doc)
+                count, render = len(doc), doc.render
+            else:
+                count = await asyncio.to_thread(_pdftoppm_page_count, path)
+                render = lambda p, out, dpi, max_side, pdf=path: _pdftoppm_render(pdf, p, out, dpi, max_side)
+            for p in range(1, count + 1):
+                out = work / f"{n}-{p}.png"
+                pages.append((name, p, lambda render=render, p=p, out=out: render(p, out, dpi, max_side)))
+        else:
+            out = work / f"{n}.png"
+            pages.append((name, 1, lambda path=path, out=out: _decode_image(path, out, max_side)))
+    return pages
+
+
+def _max_concurrency(request: Request, model_id: str) -> int:
+    store = getattr(request.app.state, "config_store", None)
+    entry = store.model_entry(model_id) if store is not None else None
+    return max(1, int((entry or {}).get("max_concurrency") or 1))
+
+
+@ocr_router.post("/batch")
+async def ocr_batch(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    model: str = Form(DEFAULT_MODEL),
+    max_tokens: int = Form(1024),
+    dpi: int = Form(DEFAULT_DPI),
+    max_side: int = Form(DEFAULT_MAX_SIDE),
+):
+    handler = await resolve_handler(request, model)
+    if handler is None or getattr(handler, "handler_type", "") != "multimodal":
+        await release_handler(request)
+        raise HTTPException(400, f"Model '{model}' is not a multimodal model")
+
+    work = Path(tempfile.mkdtemp(prefix="ocr-batch-"))
+    docs: list[_PdfDocument] = []
+
+    def close_docs():
+        for doc in docs:
+            doc.close()
+        shutil.rmtree(work, ignore_errors=True)
+
+    try:
+        pages = await _expand(files, work, dpi, max_side, docs)
+    except BaseException as e:
+        await asyncio.to_thread(close_docs)
+        await release_handler(request)
+        # PdfiumError is a RuntimeError
+        if isinstance(e, (OSError, ValueError, RuntimeError, subprocess.CalledProcessError)):
+            raise HTTPException(400, f"Could not read upload: {e}")
+        raise
+
+    concurrency = _max_concurrency(request, model)
+    in_model = asyncio.Semaphore(concurrency)
+    # decoded pages waiting for the model, plus those in it
+    ahead = asyncio.Semaphore(concurrency * 2)
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    logger.info(f"[ocr-batch] {len(pages)} page(s) from {len(files)} file(s) → '{model}' (concurrency={concurrency})")
+
+    async def run_page(index: int, source: str, page: int, prepare: Callable[[], str]) -> dict:
+        result = {"index": index, "source": source, "page": page}
+        t0 = time.monotonic()
+        try:
+            async with ahead:
+                path = await loop.run_in_executor(_pool, prepare)
+                async with in_model:
+                    chat = ChatCompletionRequest(
+                        model=model, messages=_messages(path), max_tokens=max_tokens, temperature=0.0,
+                    )
+                    out = await handler.generate_multimodal_response(chat)
+            usage = out.get("usage")
+            result.update(
+                text=(out.get("response") or {}).get("content") or "",
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", None),
+            )
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            result["error"] = detail if isinstance(detail, str) else json.dumps(detail, ensure_ascii=False)
+        result["seconds"] = round(time.monotonic() - t0, 2)
+        return result
+
+    async def stream():
+        tasks = [asyncio.create_task(run_page(i, *p)) for i, p in enumerate(pages)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += "error" in result
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True,
+                "pages": len(pages),
+                "failed": failed,
+                "seconds": round(time.monotonic() - started, 2),
+            }) + "\n"
+        finally:
+            # client went away: stop feeding the model
+            for t in tasks:
+                t.cancel()
+            await asyncio.to_thread(close_docs)
+            await release_handler(request)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def install(app):
+    app.include_router(ocr_router)
+    logger.info("OCR batch API installed: POST /v1/ocr/batch")
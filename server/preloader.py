@@ -0,0 +1,318 @@
+"""
+Predictive preloading of lazy models from request history.
+
+Two signals:
+  - co-occurrence: "a burst on model A is usually followed by model B within
+    follow_window_s" — B is warmed as soon as a new A burst starts
+  - time of day: B is warmed lead_minutes before a 15-minute slot in which it
+    was used on most of the recently observed days
+
+Preloads never evict anything: a model is only warmed if the MemoryScheduler
+says it fits as-is.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable
+
+from loguru import logger
+
+import metrics
+from background_tasks import spawn
+
+_SLOT_MINUTES = 15
+_TICK_SECONDS = 60
+
+
+def _slot_of(ts: float) -> tuple[str, int]:
+    lt = time.localtime(ts)
+    return time.strftime("%Y-%m-%d", lt), (lt.tm_hour * 60 + lt.tm_min) // _SLOT_MINUTES
+
+
+class ArrivalRecorder:
+    """Pass-through for eager handlers: records usage, and arrivals for the predictor.
+
+    Eager models have no LazyHandlerProxy, so this is where their last-request
+    time, request count and in-flight requests come from for /v1/admin/usage.
+    """
+
+    _PASSTHROUGH = {"get_queue_stats", "start", "cleanup"}
+
+    def __init__(self, handler: Any, model_id: str, on_request: Callable[[str], None] | None = None):
+        self._handler = handler
+        self._model_id = model_id
+        self._on_request = on_request
+        self.last_request_time: float = 0.0
+        self.request_count: int = 0
+        self.in_flight: int = 0
+
+    def _begin(self):
+        if self._on_request is not None:
+            self._on_request(self._model_id)
+        # eager models never wait for a load; keeps the histogram's count = requests
+        metrics.QUEUE_WAIT_SECONDS.observe(0.0, model=self._model_id)
+        self.last_request_time = time.monotonic()
+        self.request_count += 1
+        self.in_flight += 1
+
+    def _end(self):
+        self.in_flight -= 1
+        self.last_request_time = time.monotonic()
+
+    def usage(self) -> dict:
+        """Same shape as LazyHandlerProxy.usage(); eager models are always loaded."""
+        idle = time.monotonic() - self.last_request_time if self.last_request_time else None
+        return {
+            "loaded": True,
+            "state": "loaded",
+            "request_count": self.request_count,
+            "in_flight": self.in_flight,
+            "last_request_at": time.time() - idle if idle is not None else None,
+            "idle_seconds": idle,
+        }
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._handler, name)
+        if name in self._PASSTHROUGH:
+            return attr
+
+        if inspect.isasyncgenfunction(attr):
+            async def gen_wrapper(*args, **kwargs):
+                self._begin()
+                try:
+                    async for chunk in metrics.observe_stream(self._model_id, attr(*args, **kwargs)):
+                        yield chunk
+                finally:
+                    self._end()
+            return gen_wrapper
+
+        if asyncio.iscoroutinefunction(attr):
+            async def wrapper(*args, **kwargs):
+                self._begin()
+                try:
+                    return await metrics.observe_call(self._model_id, attr(*args, **kwargs))
+                finally:
+                    self._end()
+            return wrapper
+
+        return attr
+
+
+class Preloader:
+    def __init__(self, lazy_proxies: dict[str, tuple], scheduler=None, cfg: dict | None = None):
+        cfg = cfg or {}
+        tod = cfg.get("time_of_day") or {}
+        self._lazy_proxies = lazy_proxies
+        self._scheduler = scheduler
+        self.follow_window = cfg.get("follow_window_s", 30)
+        self.min_confidence = cfg.get("min_confidence", 0.6)
+        self.min_samples = cfg.get("min_samples", 5)
+        self.hit_window = cfg.get("hit_window_s", 600)
+        self.lead_minutes = tod.get("lead_minutes", 5)
+        self.min_days = tod.get("min_days", 3)
+        self.history_days = tod.get("history_days", 14)
+        self._state_file = Path(cfg["state_file"]).expanduser() if cfg.get("state_file") else None
+
+        # co-occurrence: bursts[A] episodes, follows[A][B] episodes of A followed by B
+        self._bursts: dict[str, int] = defaultdict(int)
+        self._follows: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._open: dict[str, tuple[float, set[str]]] = {}   # A -> (last arrival, followers seen)
+        # time of day: model -> slot -> set of days with activity in that slot
+        self._slot_days: dict[str, dict[int, set[str]]] = defaultdict(lambda: defaultdict(set))
+        self._days_seen: set[str] = set()
+
+        # preload accounting
+        self._pending: dict[str, tuple[float, str]] = {}      # model -> (preloaded at, reason)
+        self._warming: set[str] = set()
+        self._warm_tasks: set[asyncio.Task] = set()          # strong refs until done
+        self._tod_fired: set[tuple[str, str, int]] = set()    # (model, day, slot)
+        self.stats = {"preloads": 0, "hits": 0, "wasted": 0, "skipped_memory": 0}
+        self._task: asyncio.Task | None = None
+        self._load()
+
+    @classmethod
+    def from_config(cls, lazy_proxies, scheduler, raw: dict | None) -> "Preloader | None":
+        if not raw or not raw.get("enabled", False):
+            return None
+        return cls(lazy_proxies, scheduler, raw)
+
+    # ── recording ─────────────────────────────────────────────────────────
+
+    def record(self, model_id: str):
+        """Called on every request arrival (before any cold start)."""
+        now = time.time()
+        day, slot = _slot_of(now)
+        self._days_seen.add(day)
+        self._slot_days[model_id][slot].add(day)
+
+        if model_id in self._pending:
+            at, reason = self._pending.pop(model_id)
+            self.stats["hits"] += 1
+            logger.info(f"[preload] hit '{model_id}' ({reason}, {now - at:.0f}s after warm-up)")
+
+        for leader, (last, seen) in self._open.items():
+            if leader != model_id and model_id not in seen and now - last <= self.follow_window:
+                seen.add(model_id)
+                self._follows[leader][model_id] += 1
+
+        prev = self._open.get(model_id)
+        if prev is None or now - prev[0] > self.follow_window:
+            self._bursts[model_id] += 1
+            self._open[model_id] = (now, set())
+            self._predict_followers(model_id)
+        else:
+            self._open[model_id] = (now, prev[1])
+
+    def _predict_followers(self, leader: str):
+        n = self._bursts[leader]
+        if n < self.min_samples:
+            return
+        for follower, count in self._follows[leader].items():
+            if count / n >= self.min_confidence:
+                self._preload(follower, f"after:{leader} p={count / n:.2f}")
+
+    # ── preloading ────────────────────────────────────────────────────────
+
+    def _preload(self, model_id: str, reason: str):
+        entry = self._lazy_proxies.get(model_id)
+        if entry is None:
+            return
+        handler = entry[0]
+        if handler.is_loaded() or handler.is_transitioning() or model_id in self._pending:
+            return
+        # reserve now, not just check: several preloads in one tick must not overcommit,
+        # and make_room keeps this reservation instead of evicting for it
+        if self._scheduler is not None and not self._scheduler.try_reserve(model_id):
+            self.stats["skipped_memory"] += 1
+            logger.debug(f"[preload] skip '{model_id}' ({reason}): would need eviction")
+            return
+        self._pending[model_id] = (time.time(), reason)
+        self.stats["preloads"] += 1
+        logger.info(f"[preload] warming '{model_id}' ({reason})")
+        spawn(self._warm(model_id, handler), self._warm_tasks, f"[preload] warming '{model_id}'")
+
+    async def _warm(self, model_id: str, handler):
+        self._warming.add(model_id)
+        try:
+            await handler._ensure_started()
+        except Exception as e:
+            self._pending.pop(model_id, None)
+            logger.warning(f"[preload] warming '{model_id}' failed: {e}")
+        finally:
+            self._warming.discard(model_id)
+            # rejected before loading (e.g. cold-start queue full): drop our reservation
+            if self._scheduler is not None and not handler.is_loaded() and not handler.is_transitioning():
+                self._scheduler.release_reservation(model_id)
+
+    def _check_time_of_day(self):
+        if len(self._days_seen) < self.min_days:
+            return
+        day, slot = _slot_of(time.time() + self.lead_minutes * 60)
+        days = min(len(self._days_seen), self.history_days)
+        for model_id, slots in self._slot_days.items():
+            ratio = len(slots.get(slot, ())) / days
+            if ratio >= self.min_confidence and (model_id, day, slot) not in self._tod_fired:
+                # fire once per slot so a wasted warm-up isn't retried every tick
+                self._tod_fired.add((model_id, day, slot))
+                self._preload(model_id, f"time_of_day slot={slot} p={ratio:.2f}")
+
+    def _expire_pending(self):
+        now = time.time()
+        for model_id, (at, reason) in list(self._pending.items()):
+            entry = self._lazy_proxies.get(model_id)
+            unloaded = model_id not in self._warming and (entry is None or not entry[0].is_loaded())
+            if now - at > self.hit_window or unloaded:
+                del self._pending[model_id]
+                self.stats["wasted"] += 1
+                logger.info(f"[preload] wasted '{model_id}' ({reason})")
+
+    def _trim_history(self):
+        keep = set(sorted(self._days_seen)[-self.history_days:])
+        self._days_seen = keep
+        self._tod_fired = {k for k in self._tod_fired if k[1] in keep}
+        for slots in self._slot_days.values():
+            for days in slots.values():
+                days.intersection_update(keep)
+
+    # ── lifecycle ─────────────────────────────────────────────────────────
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="preloader")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._save()
+
+    async def _run(self):
+        ticks = 0
+        while True:
+            await asyncio.sleep(_TICK_SECONDS)
+            try:
+                self._expire_pending()
+                self._check_time_of_day()
+                ticks += 1
+                if ticks % 60 == 0:
+                    self._trim_history()
+                    self._save()
+            except Exception as e:
+                logger.error(f"[preload] tick failed: {e}")
+
+    def _load(self):
+        if self._state_file is None or not self._state_file.exists():
+            return
+        try:
+            raw = json.loads(self._state_file.read_text())
+        except Exception as e:
+            logger.warning(f"[preload] ignoring unreadable state file: {e}")
+            return
+        self._bursts.update(raw.get("bursts", {}))
+        for leader, followers in raw.get("follows", {}).items():
+            self._follows[leader].update(followers)
+        for model_id, slots in raw.get("slot_days", {}).items():
+            for slot, days in slots.items():
+                self._slot_days[model_id][int(slot)].update(days)
+        self._days_seen.update(raw.get("days_seen", []))
+
+    def _save(self):
+        if self._state_file is None:
+            return
+        raw = {
+            "bursts": dict(self._bursts),
+            "follows": {a: dict(f) for a, f in self._follows.items()},
+            "slot_days": {
+                m: {str(s): sorted(d) for s, d in slots.items() if d}
+                for m, slots in self._slot_days.items()
+            },
+            "days_seen": sorted(self._days_seen),
+        }
+        try:
+            tmp = self._state_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(raw))
+            tmp.replace(self._state_file)
+        except Exception as e:
+            logger.warning(f"[preload] failed to save state: {e}")
+
+    def snapshot(self) -> dict:
+        resolved = self.stats["hits"] + self.stats["wasted"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / resolved, 3) if resolved else None,
+            "pending": {m: reason for m, (_, reason) in self._pending.items()},
+            "co_occurrence": {
+                a: {b: round(c / self._bursts[a], 2) for b, c in f.items()}
+                for a, f in self._follows.items() if f and self._bursts.get(a)
+            },
+            "days_observed": len(self._days_seen),
+        }
@@ -0,0 +1,23 @@
+"""
+Handler lookup for routes added on top of mlx-server.
+Wraps mlx-server's request-scoped resolution (registry lookup, on-demand
+loading and its release) so the routes here don't reach into its private
+endpoint helpers; only this module depends on them.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import Request
+
+from app.api.endpoints import _release_on_demand, _resolve_handler
+
+
+async def resolve_handler(raw_request: Request, model_id: str) -> Any | None:
+    """The handler serving ``model_id`` (404/503 as HTTPException); pair with release_handler."""
+    return await _resolve_handler(raw_request, model_id=model_id)
+
+
+async def release_handler(raw_request: Request) -> None:
+    """Drop the on-demand reference taken by resolve_handler once the request is done."""
+    await _release_on_demand(raw_request)
@@ -6,18 +6,40 @@ Two-phase processing to avoid MLX memory contention:
   Phase 2: Unload ASR model, then LLM-correct all pending files
 """
 
+import csv
+import io
 import json
 import os
 import re
 import sys
 import time
+import wave
+import argparse
+import atexit
+import hashlib
 import shutil
+import sqlite3
 import subprocess
+import threading
+import uuid
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
 import httpx
 
+try:
+    import numpy as np
+except ImportError:  # VAD boundaries need numpy; fall back to fixed cuts
+    np = None
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # no change notifications; the pending index is kept fresh by polling
+    FileSystemEventHandler = object
+    Observer = None
+
 
 # ============================================================================
 # Configuration
@@ -25,19 +47,74 @@ import httpx
 
 WATCH_DIR = Path.home() / "transcribe"
 DONE_DIR = WATCH_DIR / "done"
-POLL_INTERVAL = 15  # seconds
+POLL_INTERVAL = 15  # seconds; full rescan interval when the watchdog package is missing
+STABLE_SECONDS = 5  # a file is complete once its size/mtime hasn't changed for this long
+EVENT_RESCAN_INTERVAL = 600  # safety rescan for missed events when watchdog is active
+JOBS_DB = WATCH_DIR / ".transcribe-jobs.sqlite3"
+MAX_ATTEMPTS = 3        # per stage, then the job is parked as failed (see --retry)
+RETRY_BACKOFF = 300     # seconds before the 2nd attempt, doubled after each failure
+ARCHIVE_AFTER_DAYS = 7  # keep finished recordings in WATCH_DIR this long before done/
 
 ASR_API = "http://127.0.0.1:8788/v1"     # mlx-audio server (Qwen3-ASR)
+# Extra mlx-audio servers (e.g. other Macs on the LAN), comma-separated; "url*N" = N parallel slots
+ASR_APIS = [u.strip() for u in os.environ.get("TRANSCRIBE_ASR_APIS", ASR_API).split(",") if u.strip()]
+ASR_HEALTH_TIMEOUT = 5.0    # seconds for the GET /models probe
+ASR_BACKEND_COOLDOWN = 60   # seconds a backend sits out after a connection failure
+ASR_BACKEND_MAX_ERRORS = 3  # consecutive HTTP errors before a backend also sits out
 LLM_API = "http://127.0.0.1:8787/v1"     # mlx-openai-server (Qwen3.5-35B)
 ASR_MODEL = "mlx-community/Qwen3-ASR-1.7B-8bit"
 LLM_MODEL = "qwen3.5-35b"
+# Parallel correction requests; 0 = use the model's max_concurrency from the admin API
+LLM_CONCURRENCY = int(os.environ.get("TRANSCRIBE_LLM_CONCURRENCY", "0"))
+CORRECTION_ATTEMPTS = 3  # per text chunk; streamed requests are retried here, not in request_with_retry
 
 CHUNK_MINUTES = 10
-MAX_WORKERS = 1  # mlx-audio server is single-worker, serialize requests
+# "pipe":    one ffmpeg decode streams 16 kHz PCM on stdout; chunks are uploaded
+#            straight from memory, nothing is written to disk
+# "segment": one ffmpeg decode writes every chunk via the segment muxer
+# "seek":    one ffmpeg process per chunk (-ss/-t), re-opening the source each time
+SPLIT_MODE = "pipe"
+SAMPLE_RATE = 16000
+# TRANSCRIBE_DEBUG=1 keeps chunk WAVs + per-chunk transcripts (moved to done/chunks_<stem>)
+DEBUG_KEEP_CHUNKS = os.environ.get("TRANSCRIBE_DEBUG", "") not in ("", "0")
+# Pipe mode: "vad" cuts in the quietest stretch near the target length
+# (between VAD_MIN_RATIO and VAD_MAX_RATIO of it); "fixed" cuts at exact multiples
+CHUNK_BOUNDARY = "vad"
+VAD_MIN_RATIO = 0.6
+VAD_MAX_RATIO = 1.25
+VAD_FRAME_MS = 30
+VAD_SMOOTH_FRAMES = 7          # ~200 ms moving average over frame energy
+VAD_DISTANCE_PENALTY_DB = 6.0  # cost of drifting from the target across the window
+ATEMPO = 1.5
+AUDIO_FILTER = f"silenceremove=stop_periods=-1:stop_duration=0.5:stop_threshold=-30dB,atempo={ATEMPO}"
+# ASR chunk workers = total slots over ASR_APIS (each mlx-audio server is single-worker)
+
+# Long-lived keep-alive connection pool per backend
+HTTP_POOL_SIZE = int(os.environ.get("TRANSCRIBE_HTTP_POOL", "4"))
+HTTP_RETRIES = 3        # on 5xx or dropped/refused connections
+HTTP_BACKOFF = 2.0      # seconds, doubled after each retry
 
 AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm"}
 
+_prompt_cache: tuple[tuple[int, int] | None, str] | None = None
+
+
 def get_llm_correction_prompt() -> str:
+    """Correction system prompt; rebuilt only when dict.txt changes.
+
+    The same string is reused verbatim so every chunk shares a byte-identical
+    prefix and the server's prompt cache (prompt_cache_size) skips re-prefilling it.
+    """
+    global _prompt_cache
+    dict_file = WATCH_DIR / "dict.txt"
+    try:
+        st = dict_file.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    if _prompt_cache is not None and _prompt_cache[0] == stamp:
+        return _prompt_cache[1]
+
     base_prompt = (
         "你是一个专业的语音转录校对编辑。录音内容包含普通话和粤语，可能混合使用。\n"
         "校对规则：\n"
@@ -50,16 +127,16 @@ def get_llm_correction_prompt() -> str:
         "7. 【重要】对于你不确定、发音模糊、或者疑似生僻专有名词的词语，请使用【?词语】的格式标记出来（例如：【?麦克风】）。\n"
         "只返回校对后的文本，不要添加任何说明。"
     )
-    
-    dict_file = WATCH_DIR / "dict.txt"
-    if dict_file.exists():
+
+    if stamp is not None:
         try:
             hotwords = dict_file.read_text(encoding="utf-8").strip()
             if hotwords:
                 base_prompt += f"\n\n【特别注意：以下是用户提供的专有名词/热词核对表，请在校对时优先使用这些词汇或替换规则】\n{hotwords}\n"
         except Exception as e:
             log(f"Failed to read dict.txt: {e}")
-            
+
+    _prompt_cache = (stamp, base_prompt)
     return base_prompt
 
 
@@ -71,6 +148,67 @@ def log(msg: str):
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
 
 
+# ============================================================================
+# HTTP clients
+# ============================================================================
+
+_clients: dict[str, httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+# Failures worth retrying: the server restarted, reset the connection, or is not up yet
+_RETRYABLE_ERRORS = (httpx.NetworkError, httpx.RemoteProtocolError, httpx.ConnectTimeout)
+
+
+def http_client(base_url: str) -> httpx.Client:
+    """Shared pooled client for one backend (thread-safe, reused across files)."""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = httpx.Client(
+                base_url=base_url,
+                timeout=httpx.Timeout(300.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE,
+                    keepalive_expiry=120.0,
+                ),
+            )
+            _clients[base_url] = client
+        return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+atexit.register(close_clients)
+
+
+def request_with_retry(base_url: str, method: str, path: str, retries: int = HTTP_RETRIES, **kwargs) -> httpx.Response:
+    """Send a request on the backend's pooled client, retrying 5xx and connection errors with backoff.
+
+    Returns the last response (4xx/5xx included); callers decide whether to raise.
+    """
+    client = http_client(base_url)
+    for attempt in range(retries + 1):
+        try:
+            response = client.request(method, path, **kwargs)
+            if response.status_code < 500 or attempt == retries:
+                return response
+            reason = f"HTTP {response.status_code}"
+        except _RETRYABLE_ERRORS as e:
+            if attempt == retries:
+                raise
+            reason = f"{type(e).__name__}: {e}"
+        delay = HTTP_BACKOFF * (2 ** attempt)
+        log(f"  {method} {base_url}{path} failed ({reason}); retry {attempt + 1}/{retries} in {delay:.0f}s")
+        time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
 # ============================================================================
 # Audio splitting
 # ============================================================================
@@ -86,16 +224,16 @@ def get_audio_duration(audio_path: Path) -> float:
     return float(result.stdout.strip())
 
 
-def split_audio(audio_path: Path, output_dir: Path, duration: float) -> list[Path]:
-    """Split audio into chunks (no overlap — Qwen3-ASR handles context well)."""
-    output_dir.mkdir(parents=True, exist_ok=True)
-
+def _iter_split_seek(audio_path: Path, output_dir: Path, duration: float, skip: set[int]):
     chunk_seconds = CHUNK_MINUTES * 60
     total_chunks = int((duration + chunk_seconds - 1) / chunk_seconds)
 
-    chunks = []
     for i in range(total_chunks):
         start = i * chunk_seconds
+        span = {"seconds": [start, min(start + chunk_seconds, duration)]}
+        if i in skip:
+            yield i, None, span
+            continue
         chunk_file = output_dir / f"chunk_{i:03d}.wav"
 
         cmd = [
@@ -103,113 +241,697 @@ def split_audio(audio_path: Path, output_dir: Path, duration: float) -> list[Pat
             "-ss", str(start),
             "-t", str(chunk_seconds),
             "-i", str(audio_path),
-            "-filter:a", "silenceremove=stop_periods=-1:stop_duration=0.5:stop_threshold=-30dB,atempo=1.5",
-            "-ar", "16000", "-ac", "1",
+            "-filter:a", AUDIO_FILTER,
+            "-ar", str(SAMPLE_RATE), "-ac", "1",
             str(chunk_file)
         ]
         subprocess.run(cmd, check=True)
-        chunks.append(chunk_file)
+        yield i, chunk_file, span
 
-    return chunks
+
+def _iter_split_segment(audio_path: Path, output_dir: Path):
+    """Single decode + filter pass; the segment muxer reports each finished chunk on stdout.
+
+    The csv segment list gives each chunk's start/end on the output timeline
+    (after the filter), recorded as samples like pipe mode's cuts.
+    """
+    # Segment on the output timeline: CHUNK_MINUTES of source audio before atempo
+    segment_seconds = CHUNK_MINUTES * 60 / ATEMPO
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", str(audio_path),
+        "-filter:a", AUDIO_FILTER,
+        "-ar", str(SAMPLE_RATE), "-ac", "1",
+        "-f", "segment",
+        "-segment_time", f"{segment_seconds:.3f}",
+        "-reset_timestamps", "1",
+        "-segment_list", "pipe:1",
+        "-segment_list_type", "csv",
+        str(output_dir / "chunk_%03d.wav"),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    try:
+        idx = 0
+        for row in csv.reader(proc.stdout):
+            if not row:
+                continue
+            name, start, end = row[0], float(row[1]), float(row[2])
+            span = {"samples": [round(start * SAMPLE_RATE), round(end * SAMPLE_RATE)]}
+            yield idx, output_dir / Path(name).name, span
+            idx += 1
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        rc = proc.wait()
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, cmd)
+
+
+def pcm_to_wav(pcm: bytes) -> bytes:
+    """Wrap raw s16le mono PCM in a WAV header, in memory."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def iter_pcm(audio_path: Path, block_bytes: int = 1 << 20):
+    """Single decode + filter pass; yields raw s16le 16 kHz mono PCM blocks from stdout."""
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-i", str(audio_path),
+        "-filter:a", AUDIO_FILTER,
+        "-ar", str(SAMPLE_RATE), "-ac", "1",
+        "-f", "s16le", "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        while True:
+            block = proc.stdout.read(block_bytes)
+            if not block:
+                break
+            yield block
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        rc = proc.wait()
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, cmd)
+
+
+def find_silence_cut(samples, lo: int, hi: int, target: int) -> int:
+    """Sample index in [lo, hi) at the lowest smoothed frame energy, biased toward ``target``."""
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    window = samples[lo:hi]
+    n = len(window) // frame
+    if n < VAD_SMOOTH_FRAMES:
+        return target
+    frames = window[:n * frame].reshape(n, frame).astype(np.float32)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1.0)
+    kernel = np.ones(VAD_SMOOTH_FRAMES, dtype=np.float32) / VAD_SMOOTH_FRAMES
+    smooth = np.convolve(energy_db, kernel, mode="same")
+    centers = lo + np.arange(n) * frame + frame // 2
+    cost = smooth + VAD_DISTANCE_PENALTY_DB * np.abs(centers - target) / max(1, hi - lo)
+    return int(centers[int(np.argmin(cost))])
+
+
+def _iter_split_pipe(audio_path: Path, output_dir: Path, known_ends: list[int]):
+    """Cut the PCM stream; the first len(known_ends) cuts replay a previous run's boundaries."""
+    # CHUNK_MINUTES of source audio, measured on the output timeline after atempo
+    target = int(CHUNK_MINUTES * 60 / ATEMPO) * SAMPLE_RATE
+    vad = CHUNK_BOUNDARY == "vad" and np is not None
+    if vad:
+        lo, hi = int(target * VAD_MIN_RATIO), int(target * VAD_MAX_RATIO)
+    else:
+        lo = hi = target
+    pending = bytearray()
+    consumed = 0  # samples already handed out
+    idx = 0
+    for block in iter_pcm(audio_path):
+        pending += block
+        while True:
+            if idx < len(known_ends):
+                cut = known_ends[idx] - consumed
+                if len(pending) < cut * 2:
+                    break
+            elif len(pending) >= hi * 2:
+                # only cut once the whole search window [lo, hi) is buffered
+                if vad:
+                    # temporary view: must be released before ``pending`` is resized
+                    cut = find_silence_cut(np.frombuffer(pending, dtype=np.int16, count=hi), lo, hi, target)
+                else:
+                    cut = target
+            else:
+                break
+            yield idx, _pipe_chunk(idx, bytes(pending[:cut * 2]), output_dir), {"samples": [consumed, consumed + cut]}
+            del pending[:cut * 2]
+            consumed += cut
+            idx += 1
+    if pending:
+        end = consumed + len(pending) // 2
+        yield idx, _pipe_chunk(idx, bytes(pending), output_dir), {"samples": [consumed, end]}
+
+
+def _pipe_chunk(idx: int, pcm: bytes, output_dir: Path) -> bytes:
+    wav = pcm_to_wav(pcm)
+    if DEBUG_KEEP_CHUNKS:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        (output_dir / f"chunk_{idx:03d}.wav").write_bytes(wav)
+    return wav
+
+
+def iter_split_audio(
+    audio_path: Path,
+    output_dir: Path,
+    duration: float,
+    mode: str | None = None,
+    known_ends: list[int] | None = None,
+    skip: set[int] | None = None,
+):
+    """Cut chunks one at a time, yielding (idx, chunk, span) as soon as each is ready.
+
+    ``chunk`` is in-memory WAV bytes in pipe mode and a WAV path otherwise
+    (None for seek-mode chunks in ``skip``, which are not cut at all).
+    ``span`` records the chunk boundaries for the manifest.
+    Lets the caller hand chunk N to ASR while chunk N+1 is still being cut.
+    """
+    mode = mode or SPLIT_MODE
+    if mode == "pipe":
+        yield from _iter_split_pipe(audio_path, output_dir, known_ends or [])
+        return
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if mode == "segment":
+        yield from _iter_split_segment(audio_path, output_dir)
+    elif mode == "seek":
+        yield from _iter_split_seek(audio_path, output_dir, duration, skip or set())
+    else:
+        raise ValueError(f"Unknown SPLIT_MODE '{mode}' (expected pipe|segment|seek)")
+
+
+def split_audio(audio_path: Path, output_dir: Path, duration: float, mode: str | None = None) -> list[Path | bytes]:
+    """Split audio into chunks (no overlap — Qwen3-ASR handles context well)."""
+    return [chunk for _, chunk, _ in iter_split_audio(audio_path, output_dir, duration, mode)]
+
+
+# ============================================================================
+# Chunk manifest (resumable ASR)
+# ============================================================================
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ChunkManifest:
+    """Durable ASR progress for one file: .chunks_<stem>/manifest.json.
+
+    Records the source hash, split parameters, each chunk's boundaries and
+    its transcript or last error. A rerun transcribes only the chunks that
+    are missing; a chunk that failed in pipe mode keeps its WAV so it can be
+    retried on its own without decoding the source again.
+    """
+    NAME = "manifest.json"
+
+    def __init__(self, chunks_dir: Path, data: dict):
+        self.chunks_dir = chunks_dir
+        self.data = data
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _params() -> dict:
+        return {
+            "split_mode": SPLIT_MODE, "chunk_minutes": CHUNK_MINUTES,
+            "chunk_boundary": CHUNK_BOUNDARY, "audio_filter": AUDIO_FILTER,
+        }
+
+    @classmethod
+    def open(cls, audio_path: Path, chunks_dir: Path) -> "ChunkManifest":
+        sha256 = file_sha256(audio_path)
+        try:
+            data = json.loads((chunks_dir / cls.NAME).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            data = None
+        if data and data.get("source_sha256") == sha256 and data.get("params") == cls._params():
+            return cls(chunks_dir, data)
+        if chunks_dir.exists():
+            log(f"  Discarding stale chunks for {audio_path.name} (source or split settings changed)")
+            shutil.rmtree(chunks_dir, ignore_errors=True)
+        manifest = cls(chunks_dir, {
+            "source": audio_path.name,
+            "source_sha256": sha256,
+            "params": cls._params(),
+            "total": None,      # set once splitting has finished
+            "chunks": {},
+        })
+        manifest.save()
+        return manifest
+
+    def save(self):
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.chunks_dir / (self.NAME + ".tmp")
+        tmp.write_text(json.dumps(self.data, ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp, self.chunks_dir / self.NAME)
+
+    def _entry(self, idx: int) -> dict:
+        return self.data["chunks"].setdefault(str(idx), {})
+
+    def is_done(self, idx: int) -> bool:
+        return "text" in self.data["chunks"].get(str(idx), {})
+
+    def done_indices(self) -> set[int]:
+        return {int(k) for k, c in self.data["chunks"].items() if "text" in c}
+
+    def missing(self) -> list[int]:
+        total = self.data["total"]
+        if total is None:
+            return []
+        return [i for i in range(total) if not self.is_done(i)]
+
+    def known_ends(self) -> list[int]:
+        """Sample offsets of consecutive cuts recorded from chunk 0 (pipe mode replays them)."""
+        ends = []
+        for i in range(self.data["total"] or len(self.data["chunks"])):
+            samples = self.data["chunks"].get(str(i), {}).get("samples")
+            if not samples:
+                break
+            ends.append(samples[1])
+        return ends
+
+    def retry_files(self) -> dict[int, Path] | None:
+        """On-disk audio for every missing chunk, or None if the source must be split again."""
+        if self.data["total"] is None:
+            return None
+        files = {}
+        for i in self.missing():
+            wav = self.chunks_dir / f"chunk_{i:03d}.wav"
+            # a chunk without recorded boundaries can't be trusted to match this split
+            if not wav.exists() or not set(self.data["chunks"].get(str(i), {})) & {"samples", "seconds"}:
+                return None
+            files[i] = wav
+        return files
+
+    def record_span(self, idx: int, span: dict):
+        with self._lock:
+            self._entry(idx).update(span)
+            self.save()
+
+    def record_done(self, idx: int, text: str, seconds: float):
+        with self._lock:
+            entry = self._entry(idx)
+            entry.pop("error", None)
+            entry.update(text=text, asr_seconds=round(seconds, 1), attempts=entry.get("attempts", 0) + 1)
+            self.save()
+
+    def record_failed(self, idx: int, error: str):
+        with self._lock:
+            entry = self._entry(idx)
+            entry.update(error=error, attempts=entry.get("attempts", 0) + 1)
+            self.save()
+
+    def set_total(self, total: int):
+        with self._lock:
+            self.data["total"] = total
+            self.save()
+
+    def transcript(self) -> str:
+        return "\n\n".join(self.data["chunks"][str(i)]["text"] for i in range(self.data["total"]))
 
 
 # ============================================================================
 # Transcription (Qwen3-ASR via mlx-audio server)
 # ============================================================================
 
-def transcribe_chunk(audio_file: Path) -> str:
-    """Transcribe a single audio chunk."""
-    with open(audio_file, 'rb') as f:
-        files = {'file': (audio_file.name, f, 'audio/wav')}
-        data = {'model': ASR_MODEL, 'language': 'zh'}
+class AsrBackend:
+    def __init__(self, spec: str):
+        url, _, slots = spec.partition("*")
+        self.url = url.rstrip("/")
+        self.slots = max(1, int(slots or 1))
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0   # time.monotonic(); 0 = healthy
+
+    def is_up(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+
+class AsrPool:
+    """Schedules ASR chunks over several mlx-audio servers.
+
+    Each chunk goes to the healthy backend with the fewest outstanding
+    requests per slot. A backend that drops or refuses a connection sits
+    out for ASR_BACKEND_COOLDOWN (as does one that keeps answering with
+    errors, so a fast-failing server can't soak up the queue) and the chunk
+    is re-dispatched elsewhere.
+    """
+
+    def __init__(self, specs: list[str]):
+        self.backends = [AsrBackend(spec) for spec in specs]
+        self._cond = threading.Condition()
+
+    def capacity(self) -> int:
+        return sum(b.slots for b in self.backends)
 
-        with httpx.Client(timeout=httpx.Timeout(600.0, connect=30.0)) as client:
-            response = client.post(
-                f"{ASR_API}/audio/transcriptions",
-                files=files, data=data
+    def check_health(self):
+        """Probe every backend in parallel (GET /models); unreachable ones are marked down."""
+        def probe(b: AsrBackend) -> bool:
+            try:
+                r = http_client(b.url).get("/models", timeout=httpx.Timeout(ASR_HEALTH_TIMEOUT))
+                return r.status_code < 500
+            except httpx.HTTPError:
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(self.backends)) as ex:
+            results = list(ex.map(probe, self.backends))
+        with self._cond:
+            for b, ok in zip(self.backends, results):
+                if ok:
+                    b.down_until = 0.0
+                elif b.is_up():
+                    log(f"  ASR backend {b.url} is unreachable")
+                    b.down_until = time.monotonic() + ASR_BACKEND_COOLDOWN
+            self._cond.notify_all()
+
+    def acquire(self, exclude: set[str]) -> AsrBackend:
+        """Block until a healthy backend not in ``exclude`` has a free slot.
+
+        If every such backend is cooling down, waits for the earliest
+        cooldown to expire rather than failing the chunk.
+        """
+        with self._cond:
+            while True:
+                eligible = [b for b in self.backends if b.url not in exclude]
+                if not eligible:
+                    raise RuntimeError("no ASR backend left to try for this chunk")
+                candidates = [b for b in eligible if b.is_up()]
+                if not candidates:
+                    self._cond.wait(max(0.0, min(b.down_until for b in eligible) - time.monotonic()))
+                    continue
+                free = [b for b in candidates if b.outstanding < b.slots]
+                if free:
+                    backend = min(free, key=lambda b: (b.outstanding / b.slots, b.served))
+                    backend.outstanding += 1
+                    return backend
+                # re-check periodically: a down backend's cooldown may expire
+                self._cond.wait(1.0)
+
+    def release(self, backend: AsrBackend, ok: bool, down: bool = False):
+        with self._cond:
+            backend.outstanding -= 1
+            if ok:
+                backend.served += 1
+                backend.consecutive_failures = 0
+            else:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+            if down or backend.consecutive_failures >= ASR_BACKEND_MAX_ERRORS:
+                if backend.is_up():
+                    log(f"  ASR backend {backend.url} sits out {ASR_BACKEND_COOLDOWN}s after failures")
+                backend.consecutive_failures = 0
+                backend.down_until = time.monotonic() + ASR_BACKEND_COOLDOWN
+            self._cond.notify_all()
+
+    def snapshot(self) -> str:
+        return ", ".join(
+            f"{b.url} (slots={b.slots}, served={b.served}, failures={b.failures}{'' if b.is_up() else ', down'})"
+            for b in self.backends
+        )
+
+
+asr_pool = AsrPool(ASR_APIS)
+
+
+def transcribe_chunk(audio: Path | bytes, name: str = "chunk.wav") -> str:
+    """Transcribe a single audio chunk (a WAV file or in-memory WAV bytes) on the least-busy backend."""
+    if isinstance(audio, Path):
+        name = audio.name
+        audio = audio.read_bytes()
+    files = {'file': (name, audio, 'audio/wav')}
+    data = {'model': ASR_MODEL, 'language': 'zh'}
+
+    tried: set[str] = set()
+    # with other backends to fall back to, re-dispatch instead of retrying in place
+    retries = HTTP_RETRIES if len(asr_pool.backends) == 1 else 0
+    # once every backend has failed, start over (waiting out cooldowns) up to HTTP_RETRIES times
+    rounds = 0
+    while True:
+        backend = asr_pool.acquire(exclude=tried)
+        tried.add(backend.url)
+        try:
+            response = request_with_retry(
+                backend.url, "POST", "/audio/transcriptions",
+                retries=retries, files=files, data=data,
+                timeout=httpx.Timeout(600.0, connect=30.0),
             )
             response.raise_for_status()
-            text = response.text.strip()
-            try:
-                j = json.loads(text)
-                if isinstance(j, dict) and "text" in j:
-                    return j["text"].strip()
-            except (json.JSONDecodeError, KeyError):
-                pass
-            return text
+        except Exception as e:
+            unreachable = isinstance(e, _RETRYABLE_ERRORS)
+            asr_pool.release(backend, ok=False, down=unreachable)
+            if len(tried) < len(asr_pool.backends):
+                log(f"  {name} failed on {backend.url} ({e}); re-dispatching")
+                continue
+            server_side = unreachable or (isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500)
+            if server_side and rounds < HTTP_RETRIES:
+                rounds += 1
+                tried.clear()
+                log(f"  {name} failed on every ASR backend ({e}); round {rounds}/{HTTP_RETRIES} after cooldown")
+                continue
+            raise
+        asr_pool.release(backend, ok=True)
+        break
+
+    text = response.text.strip()
+    try:
+        j = json.loads(text)
+        if isinstance(j, dict) and "text" in j:
+            return j["text"].strip()
+    except (json.JSONDecodeError, KeyError):
+        pass
+    return text
 
 
 def transcribe_file(audio_path: Path, chunks_dir: Path) -> str:
-    """Transcribe audio file. Short files direct, long files split + parallel."""
-    duration = get_audio_duration(audio_path)
-    log(f"  Duration: {duration/60:.1f} min")
+    """Transcribe audio file: split + parallel ASR, resuming from the chunk manifest.
 
-    # Always process via ffmpeg to apply 1.5x speedup
-    # if duration <= CHUNK_MINUTES * 60:
-    #     log(f"  Short file, transcribing directly...")
-    #     return transcribe_chunk(audio_path)
-
-    total_chunks = int((duration + CHUNK_MINUTES * 60 - 1) / (CHUNK_MINUTES * 60))
-    log(f"  Splitting into {total_chunks} chunks...")
-    chunk_files = split_audio(audio_path, chunks_dir, duration)
-
-    results = {}
+    Raises if any chunk is still missing; the manifest keeps the finished
+    ones so the next attempt only retries those.
+    """
+    manifest = ChunkManifest.open(audio_path, chunks_dir)
+    done = manifest.done_indices()
+    if done:
+        log(f"  Resuming: {len(done)} chunk(s) already transcribed")
 
-    def worker(idx: int, chunk_file: Path) -> tuple[int, str]:
+    def worker(idx: int, chunk: Path | bytes) -> None:
         start_time = time.time()
-        text = transcribe_chunk(chunk_file)
+        try:
+            text = transcribe_chunk(chunk, f"chunk_{idx:03d}.wav")
+        except Exception as e:
+            if isinstance(chunk, bytes):
+                # keep just this chunk so it can be retried without re-decoding the source
+                chunks_dir.mkdir(parents=True, exist_ok=True)
+                (chunks_dir / f"chunk_{idx:03d}.wav").write_bytes(chunk)
+            manifest.record_failed(idx, str(e))
+            log(f"  Chunk {idx:03d} failed: {e}")
+            return
         elapsed = time.time() - start_time
-        # Save individual chunk transcription
-        chunk_txt = chunks_dir / f"chunk_{idx:03d}.txt"
-        chunk_txt.write_text(text, encoding='utf-8')
+        manifest.record_done(idx, text, elapsed)
+        if SPLIT_MODE == "pipe" and not DEBUG_KEEP_CHUNKS:
+            (chunks_dir / f"chunk_{idx:03d}.wav").unlink(missing_ok=True)
         log(f"  Chunk {idx:03d} done ({elapsed:.1f}s)")
-        return idx, text
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(worker, i, cf): i
-            for i, cf in enumerate(chunk_files)
-        }
+    retry_files = manifest.retry_files()
+    asr_pool.check_health()
+    workers = asr_pool.capacity()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        if retry_files is not None:
+            # Already fully split: retry the missing chunks from disk in isolation
+            log(f"  Retrying {len(retry_files)} chunk(s) from {chunks_dir.name}")
+            for i, wav in retry_files.items():
+                futures.append(executor.submit(worker, i, wav))
+        else:
+            duration = get_audio_duration(audio_path)
+            log(f"  Duration: {duration/60:.1f} min")
+            total_chunks = int((duration + CHUNK_MINUTES * 60 - 1) / (CHUNK_MINUTES * 60))
+            log(f"  Splitting into ~{total_chunks} chunks ({SPLIT_MODE}, pipelined with ASR)...")
+
+            # Producer/consumer: ffmpeg cuts chunk N+1 in this thread while the pool
+            # transcribes chunk N, so wall time is ~max(split, ASR) instead of the sum.
+            count = 0
+            for i, chunk, span in iter_split_audio(
+                audio_path, chunks_dir, duration,
+                known_ends=manifest.known_ends(), skip=done,
+            ):
+                count += 1
+                if span:
+                    manifest.record_span(i, span)
+                if i in done:
+                    continue
+                # Backpressure: in pipe mode every queued chunk is held in RAM
+                pending = [f for f in futures if not f.done()]
+                if len(pending) >= workers * 2:
+                    wait(pending, return_when=FIRST_COMPLETED)
+                futures.append(executor.submit(worker, i, chunk))
+            # silence removal makes the real chunk count vary in pipe/segment mode
+            manifest.set_total(count)
         for future in as_completed(futures):
-            idx, text = future.result()
-            results[idx] = text
+            future.result()
+    if len(asr_pool.backends) > 1:
+        log(f"  ASR backends: {asr_pool.snapshot()}")
 
-    merged = []
-    for i in range(total_chunks):
-        if i in results:
-            merged.append(results[i])
-    return "\n\n".join(merged)
+    missing = manifest.missing()
+    if missing:
+        raise RuntimeError(
+            f"{len(missing)}/{manifest.data['total']} chunk(s) failed "
+            f"({', '.join(f'{i:03d}' for i in missing)}); finished chunks kept in {chunks_dir.name}"
+        )
+    return manifest.transcript()
+
+
+def _host(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    return "localhost" if host in ("127.0.0.1", "::1") else host
 
 
 def unload_asr_model():
-    """Unload ASR model from mlx-audio server to free memory for LLM."""
-    try:
-        with httpx.Client(timeout=httpx.Timeout(10.0)) as client:
-            response = client.request(
-                "DELETE", f"{ASR_API}/models",
-                params={"model_name": ASR_MODEL}
+    """Unload ASR model from mlx-audio servers sharing the LLM's machine to free memory for it."""
+    for backend in asr_pool.backends:
+        # remote ASR Macs don't compete with the LLM for memory; keep them warm
+        if _host(backend.url) != _host(LLM_API):
+            continue
+        try:
+            response = request_with_retry(
+                backend.url, "DELETE", "/models",
+                retries=0,
+                params={"model_name": ASR_MODEL},
+                timeout=httpx.Timeout(10.0),
             )
             if response.status_code == 200:
-                log(f"Unloaded ASR model to free memory for LLM")
+                log(f"Unloaded ASR model on {backend.url} to free memory for LLM")
             else:
-                log(f"ASR unload returned {response.status_code}")
-    except Exception as e:
-        log(f"Failed to unload ASR model: {e}")
+                log(f"ASR unload on {backend.url} returned {response.status_code}")
+        except Exception as e:
+            log(f"Failed to unload ASR model on {backend.url}: {e}")
 
 
 # ============================================================================
 # LLM Correction
 # ============================================================================
 
-def correct_text(text: str) -> str:
-    """Correct transcription text using LLM. Process in ~2000 char chunks."""
+def llm_concurrency() -> int:
+    """LLM_CONCURRENCY if set, else the model's max_concurrency from /v1/admin/models/{id}/stats."""
+    if LLM_CONCURRENCY > 0:
+        return LLM_CONCURRENCY
+    try:
+        response = request_with_retry(
+            LLM_API, "GET", f"/admin/models/{LLM_MODEL}/stats",
+            retries=0, timeout=httpx.Timeout(10.0),
+        )
+        response.raise_for_status()
+        stats = response.json().get("queue_stats") or {}
+        # loaded handlers may nest their own queue_stats
+        value = stats.get("max_concurrency") or (stats.get("queue_stats") or {}).get("max_concurrency")
+        if value:
+            return max(1, int(value))
+    except Exception as e:
+        log(f"  Could not read max_concurrency for {LLM_MODEL}: {e}")
+    return 1
+
+
+class ThinkStripper:
+    """Drops <think>…</think> blocks from streamed text as it arrives.
+
+    Reasoning text is discarded immediately; only a possible partial tag
+    at the end of a delta is held back until the next one.
+    """
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self._buf = ""
+        self._in_think = False
+        self._skip_ws = False  # whitespace right after </think> is dropped too
+
+    @staticmethod
+    def _partial_tag(text: str, tag: str) -> int:
+        for k in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:k]):
+                return k
+        return 0
+
+    def feed(self, text: str) -> str:
+        self._buf += text
+        out = []
+        while self._buf:
+            if self._in_think:
+                end = self._buf.find(self.CLOSE)
+                if end < 0:
+                    keep = self._partial_tag(self._buf, self.CLOSE)
+                    self._buf = self._buf[len(self._buf) - keep:]
+                    break
+                self._buf = self._buf[end + len(self.CLOSE):]
+                self._in_think = False
+                self._skip_ws = True
+                continue
+            if self._skip_ws:
+                self._buf = self._buf.lstrip()
+                if not self._buf:
+                    break
+                self._skip_ws = False
+            start = self._buf.find(self.OPEN)
+            if start >= 0:
+                out.append(self._buf[:start])
+                self._buf = self._buf[start + len(self.OPEN):]
+                self._in_think = True
+                continue
+            keep = self._partial_tag(self._buf, self.OPEN)
+            out.append(self._buf[:len(self._buf) - keep])
+            self._buf = self._buf[len(self._buf) - keep:]
+            break
+        return "".join(out)
+
+    def flush(self) -> str:
+        rest = "" if self._in_think else self._buf
+        self._buf = ""
+        return rest
+
+
+def iter_sse_content(response: httpx.Response):
+    """Yield delta.content strings from an OpenAI-style chat completion stream."""
+    for line in response.iter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices") or []
+        if choices:
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def correct_chunk(chunk: str, system_prompt: str) -> str:
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": chunk}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 4096,
+        "stream": True,
+    }
+    stripper = ThinkStripper()
+    parts = []
+    with http_client(LLM_API).stream("POST", "/chat/completions", json=payload) as response:
+        response.raise_for_status()
+        for delta in iter_sse_content(response):
+            parts.append(stripper.feed(delta))
+    parts.append(stripper.flush())
+    corrected = "".join(parts).strip()
+    if not corrected:
+        raise ValueError("empty correction (cut off while reasoning?)")
+    return corrected
+
+
+def split_text(text: str, max_chars: int = 2000) -> list[str]:
+    """Split on line boundaries into chunks of ~max_chars (deterministic, so resume can rely on it)."""
     lines = text.split('\n')
     chunks = []
     current_chunk = []
     current_len = 0
 
     for line in lines:
-        if current_len + len(line) > 2000 and current_chunk:
+        if current_len + len(line) > max_chars and current_chunk:
             chunks.append('\n'.join(current_chunk))
             current_chunk = [line]
             current_len = len(line)
@@ -219,43 +941,101 @@ def correct_text(text: str) -> str:
 
     if current_chunk:
         chunks.append('\n'.join(current_chunk))
+    return chunks
+
+
+def partial_md_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".partial")
+
 
+def progress_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".progress.json")
+
+
+def _resume_point(out_path: Path, raw_sha256: str, total: int) -> int:
+    """Chunks already in the .partial file from an earlier run (0 = start over)."""
+    partial = partial_md_path(out_path)
+    try:
+        progress = json.loads(progress_path(out_path).read_text(encoding='utf-8'))
+        size = partial.stat().st_size
+    except (OSError, ValueError):
+        return 0
+    if progress.get("raw_sha256") != raw_sha256 or progress.get("chunks") != total:
+        return 0
+    if size < progress.get("bytes", 0):
+        return 0
+    # Drop anything appended after the last recorded chunk
+    with open(partial, "r+b") as f:
+        f.truncate(progress["bytes"])
+    return int(progress.get("done", 0))
+
+
+def _write_progress(out_path: Path, raw_sha256: str, total: int, done: int, nbytes: int):
+    tmp = progress_path(out_path).with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "raw_sha256": raw_sha256, "chunks": total, "done": done, "bytes": nbytes,
+    }), encoding='utf-8')
+    os.replace(tmp, progress_path(out_path))
+
+
+def correct_text(text: str, out_path: Path) -> str:
+    """Correct transcription text using LLM, streaming finished chunks into ``out_path``.
+
+    Chunks (~2000 chars) are appended in order to ``<out>.partial`` with a
+    ``<out>.progress.json`` sidecar; a restarted run resumes after the last
+    completed chunk. ``out_path`` appears only once every chunk is written.
+    """
+    chunks = split_text(text)
     if not chunks:
+        out_path.write_text(text, encoding='utf-8')
         return text
 
-    log(f"  Correcting {len(chunks)} text chunks...")
+    raw_sha256 = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    done = _resume_point(out_path, raw_sha256, len(chunks))
+    if done:
+        log(f"  Resuming correction at chunk {done + 1}/{len(chunks)}")
 
-    corrected_parts = []
-    for i, chunk in enumerate(chunks):
-        try:
-            payload = {
-                "model": LLM_MODEL,
-                "messages": [
-                    {"role": "system", "content": get_llm_correction_prompt()},
-                    {"role": "user", "content": chunk}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 4096,
-            }
-
-            with httpx.Client(timeout=httpx.Timeout(300.0, connect=10.0)) as client:
-                response = client.post(
-                    f"{LLM_API}/chat/completions", json=payload
-                )
-                response.raise_for_status()
-                result = response.json()
-                corrected = result["choices"][0]["message"]["content"].strip()
-                corrected = re.sub(r'<think>.*?</think>\s*', '', corrected, flags=re.DOTALL)
-                corrected_parts.append(corrected)
-                log(f"  Correction chunk {i+1}/{len(chunks)} done")
-        except Exception as e:
-            log(f"  Correction chunk {i+1}/{len(chunks)} failed: {e}")
-            corrected_parts.append(chunk)
+    # One prompt per file: dict.txt edits mid-file must not break the shared prefix
+    system_prompt = get_llm_correction_prompt()
+    concurrency = max(1, min(llm_concurrency(), len(chunks) - done))
+    log(f"  Correcting {len(chunks) - done} text chunks (concurrency {concurrency})...")
 
-    corrected_full = "\n\n".join(corrected_parts)
-    
-    # Extract uncertain words marked by LLM
-    uncertain_words = set(re.findall(r'【\?(.*?)】', corrected_full))
+    def worker(i: int, chunk: str) -> str:
+        for attempt in range(1, CORRECTION_ATTEMPTS + 1):
+            try:
+                corrected = correct_chunk(chunk, system_prompt)
+                log(f"  Correction chunk {i+1}/{len(chunks)} done")
+                return corrected
+            except Exception as e:
+                log(f"  Correction chunk {i+1}/{len(chunks)} attempt {attempt}/{CORRECTION_ATTEMPTS} failed: {e}")
+                if attempt < CORRECTION_ATTEMPTS:
+                    time.sleep(HTTP_BACKOFF * attempt)
+        log(f"  Correction chunk {i+1}/{len(chunks)} keeping raw text")
+        return chunk
+
+    # Chunks finish out of order; each is appended only once all earlier ones are
+    ready: dict[int, str] = {}
+    new_parts = []
+    with open(partial_md_path(out_path), "ab" if done else "wb") as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(worker, i, chunks[i]): i for i in range(done, len(chunks))}
+        for future in as_completed(futures):
+            ready[futures[future]] = future.result()
+            while done in ready:
+                part = ready.pop(done)
+                out.write((("\n\n" if done else "") + part).encode('utf-8'))
+                out.flush()
+                os.fsync(out.fileno())
+                new_parts.append(part)
+                done += 1
+                _write_progress(out_path, raw_sha256, len(chunks), done, out.tell())
+
+    os.replace(partial_md_path(out_path), out_path)
+    progress_path(out_path).unlink(missing_ok=True)
+    corrected_full = out_path.read_text(encoding='utf-8')
+
+    # Extract uncertain words marked by LLM (chunks corrected in this run only)
+    uncertain_words = set(re.findall(r'【\?(.*?)】', "\n".join(new_parts)))
     if uncertain_words:
         pending_file = WATCH_DIR / "dict_pending.txt"
         try:
@@ -270,31 +1050,183 @@ def correct_text(text: str) -> str:
     return corrected_full
 
 
+def measure_ttft(system_prompt: str, user_text: str) -> float:
+    """Seconds until the first streamed token of a correction request.
+
+    The stream opens with a role-only chunk before prefill runs; only a
+    delta carrying content marks the first token (reasoning tokens count,
+    since prefill is what the prefix cache saves).
+    """
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_text},
+        ],
+        "temperature": 0.3,
+        "max_tokens": 8,
+        "stream": True,
+    }
+    start = time.perf_counter()
+    with http_client(LLM_API).stream("POST", "/chat/completions", json=payload) as response:
+        response.raise_for_status()
+        for _ in iter_sse_content(response):
+            return time.perf_counter() - start
+    raise ValueError("stream ended without a content token")
+
+
+def bench_prefix_cache(sample: Path | None, rounds: int = 5):
+    """Compare TTFT with the shared system prompt vs. a cache-busted copy of it."""
+    text = sample.read_text(encoding="utf-8") if sample else "今天我们讨论一下项目的进度，然后呢就是说下周要交付。\n" * 200
+    size = max(1, min(2000, len(text) // (2 * rounds + 1)))
+    parts = [text[i * size:(i + 1) * size] for i in range(2 * rounds + 1)]
+    system_prompt = get_llm_correction_prompt()
+    log(f"Prefix-cache bench: {LLM_MODEL}, system prompt {len(system_prompt)} chars, {rounds} rounds")
+
+    measure_ttft(system_prompt, parts[0])  # warm-up: loads the model and seeds the cache
+    cached, busted = [], []
+    for i in range(rounds):
+        # distinct user text each time, so only the system prompt can be reused
+        cached.append(measure_ttft(system_prompt, parts[1 + 2 * i]))
+        busted.append(measure_ttft(f"[{uuid.uuid4().hex}]\n{system_prompt}", parts[2 + 2 * i]))
+
+    def median(xs: list[float]) -> float:
+        return sorted(xs)[len(xs) // 2]
+
+    c, b = median(cached), median(busted)
+    log(f"  TTFT cached prefix: {c * 1000:.0f} ms (median)")
+    log(f"  TTFT cache-busted:  {b * 1000:.0f} ms (median)")
+    log(f"  Prefill saved per chunk: {(b - c) * 1000:.0f} ms")
+
+
 # ============================================================================
 # File helpers
 # ============================================================================
 
-_file_sizes: dict[str, int] = {}
+def _iter_watch_files():
+    """Files under WATCH_DIR, skipping done/ and hidden dirs (.chunks_*) without descending into them."""
+    stack = [WATCH_DIR]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.startswith(".") or Path(entry.path) == DONE_DIR:
+                            continue
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+        except OSError:
+            continue
 
 
-def is_file_stable(filepath: Path) -> bool:
-    key = str(filepath)
-    try:
-        current_size = filepath.stat().st_size
-    except OSError:
-        _file_sizes.pop(key, None)
+def _is_watched_audio(path: Path) -> bool:
+    if path.suffix.lower() not in AUDIO_EXTENSIONS:
         return False
-    if current_size == 0:
-        return False
-    prev_size = _file_sizes.get(key)
-    _file_sizes[key] = current_size
-    if prev_size is None:
+    try:
+        rel = path.relative_to(WATCH_DIR)
+    except ValueError:
         return False
-    return prev_size == current_size
+    # done/ and .chunks_<stem>/ hold our own outputs
+    return not any(part.startswith(".") or part == DONE_DIR.name for part in rel.parts[:-1])
 
 
-def processing_marker(audio_path: Path) -> Path:
-    return audio_path.with_suffix(audio_path.suffix + ".processing")
+class PendingIndex:
+    """In-memory index of audio files waiting in WATCH_DIR.
+
+    Fed by filesystem events (or periodic rescans), so a scan never walks
+    the done/ archive. A file counts as stable once its (size, mtime) has
+    been unchanged for STABLE_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: dict[Path, tuple[int, int, float]] = {}  # path -> (size, mtime_ns, last change)
+        self.wake = threading.Event()
+
+    def touch(self, path: Path):
+        if not _is_watched_audio(path):
+            return
+        try:
+            st = path.stat()
+        except OSError:
+            self.discard(path)
+            return
+        with self._lock:
+            prev = self._files.get(path)
+            changed = prev is None or prev[:2] != (st.st_size, st.st_mtime_ns)
+            if changed:
+                self._files[path] = (st.st_size, st.st_mtime_ns, time.monotonic())
+        if prev is None:
+            # writes to a known file only push its settle deadline back (debounce)
+            self.wake.set()
+
+    def discard(self, path: Path):
+        with self._lock:
+            self._files.pop(path, None)
+
+    def rescan(self):
+        found = set()
+        for entry in _iter_watch_files():
+            path = Path(entry.path)
+            if path.suffix.lower() in AUDIO_EXTENSIONS:
+                found.add(path)
+                self.touch(path)
+        with self._lock:
+            for path in set(self._files) - found:
+                del self._files[path]
+
+    def files(self) -> list[Path]:
+        with self._lock:
+            return sorted(self._files)
+
+    def is_stable(self, path: Path) -> bool:
+        """Re-stat ``path``; True once it is non-empty and unchanged for STABLE_SECONDS."""
+        self.touch(path)
+        with self._lock:
+            entry = self._files.get(path)
+        if entry is None or entry[0] == 0:
+            return False
+        return time.monotonic() - entry[2] >= STABLE_SECONDS
+
+    def next_check_in(self) -> float | None:
+        """Seconds until the earliest still-settling file could become stable."""
+        now = time.monotonic()
+        with self._lock:
+            waits = [STABLE_SECONDS - (now - changed) for _, _, changed in self._files.values()
+                     if now - changed < STABLE_SECONDS]
+        return max(0.0, min(waits)) if waits else None
+
+
+class _WatchHandler(FileSystemEventHandler):
+    def __init__(self, index: PendingIndex):
+        super().__init__()
+        self.index = index
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            # a folder dropped or moved in: pick up its contents
+            if event.event_type in ("created", "moved"):
+                self.index.rescan()
+            return
+        if event.event_type == "deleted":
+            self.index.discard(Path(event.src_path))
+        elif event.event_type == "moved":
+            self.index.discard(Path(event.src_path))
+            self.index.touch(Path(event.dest_path))
+        else:
+            self.index.touch(Path(event.src_path))
+
+
+def start_observer(index: PendingIndex):
+    """Start change notifications (FSEvents/inotify via watchdog); None if unavailable."""
+    if Observer is None:
+        return None
+    observer = Observer()
+    observer.schedule(_WatchHandler(index), str(WATCH_DIR), recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
 
 
 def raw_md_path(audio_path: Path) -> Path:
@@ -305,29 +1237,183 @@ def corrected_md_path(audio_path: Path) -> Path:
     return audio_path.parent / f"{audio_path.stem}_corrected.md"
 
 
-def audio_files() -> list[Path]:
-    result = []
-    for entry in sorted(WATCH_DIR.rglob("*")):
-        if DONE_DIR in entry.parents:
-            continue
-        if entry.is_file() and entry.suffix.lower() in AUDIO_EXTENSIONS:
-            result.append(entry)
-    return result
+def cleanup_stale_markers():
+    # .processing markers from versions before the job store
+    for entry in _iter_watch_files():
+        if entry.name.endswith(".processing"):
+            log(f"Cleanup: removing stale marker {entry.name}")
+            os.unlink(entry.path)
 
 
-def cleanup_stale_markers():
-    for marker in WATCH_DIR.rglob("*.processing"):
-        if DONE_DIR in marker.parents:
-            continue
-        log(f"Cleanup: removing stale marker {marker.name}")
-        marker.unlink()
+# ============================================================================
+# Job store
+# ============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              INTEGER PRIMARY KEY,
+    path            TEXT NOT NULL UNIQUE,
+    state           TEXT NOT NULL,      -- pending|transcribing|transcribed|correcting|corrected|archived|failed
+    priority        INTEGER NOT NULL DEFAULT 0,
+    attempts        INTEGER NOT NULL DEFAULT 0,   -- failures in the current stage
+    error           TEXT,
+    size            INTEGER,
+    source_mtime    REAL,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    asr_started_at  REAL,
+    asr_finished_at REAL,
+    llm_started_at  REAL,
+    llm_finished_at REAL,
+    archived_path   TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS job_errors (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    at     REAL NOT NULL,
+    stage  TEXT NOT NULL,
+    error  TEXT NOT NULL
+);
+"""
+
+# state while running -> state to fall back to (and retry from)
+_RUNNING = {"transcribing": "pending", "correcting": "transcribed"}
+
+
+class JobStore:
+    """SQLite-backed queue: one row per recording with its stage, attempts and timings."""
+
+    def __init__(self, path: Path = JOBS_DB):
+        self.db = sqlite3.connect(str(path), isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+
+    def recover(self) -> int:
+        """Jobs left running by a crash go back to the queue; returns how many."""
+        n = 0
+        for running, back in _RUNNING.items():
+            n += self.db.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?", (back, time.time(), running)
+            ).rowcount
+        return n
+
+    def get(self, audio_path: Path) -> sqlite3.Row | None:
+        return self.db.execute("SELECT * FROM jobs WHERE path = ?", (str(audio_path),)).fetchone()
+
+    def enqueue(self, audio_path: Path, priority: int = 0) -> sqlite3.Row:
+        # Outputs from before the job store decide where an existing file starts
+        if corrected_md_path(audio_path).exists():
+            state = "corrected"
+        elif raw_md_path(audio_path).exists():
+            state = "transcribed"
+        else:
+            state = "pending"
+        st = audio_path.stat()
+        now = time.time()
+        self.db.execute(
+            "INSERT OR IGNORE INTO jobs (path, state, priority, size, source_mtime, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(audio_path), state, priority, st.st_size, st.st_mtime, now, now),
+        )
+        return self.get(audio_path)
+
+    def due(self, state: str) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT * FROM jobs WHERE state = ? AND next_attempt_at <= ? ORDER BY priority DESC, created_at",
+            (state, time.time()),
+        ).fetchall()
+
+    def next_due_in(self) -> float | None:
+        """Seconds until the earliest backed-off job becomes due again."""
+        row = self.db.execute(
+            "SELECT MIN(next_attempt_at) AS at FROM jobs WHERE state IN ('pending', 'transcribed') AND next_attempt_at > ?",
+            (time.time(),),
+        ).fetchone()
+        return max(0.0, row["at"] - time.time()) if row["at"] is not None else None
+
+    def start(self, job: sqlite3.Row, running: str):
+        column = "asr_started_at" if running == "transcribing" else "llm_started_at"
+        now = time.time()
+        self.db.execute(f"UPDATE jobs SET state = ?, {column} = ?, updated_at = ? WHERE id = ?",
+                        (running, now, now, job["id"]))
+
+    def finish(self, job: sqlite3.Row, state: str):
+        column = "asr_finished_at" if state == "transcribed" else "llm_finished_at"
+        now = time.time()
+        self.db.execute(
+            f"UPDATE jobs SET state = ?, {column} = ?, attempts = 0, error = NULL, next_attempt_at = 0,"
+            " updated_at = ? WHERE id = ?",
+            (state, now, now, job["id"]),
+        )
+
+    def fail(self, job: sqlite3.Row, running: str, error: str, permanent: bool = False) -> str:
+        """Record a failure; re-queue with backoff or park as failed. Returns the new state."""
+        now = time.time()
+        attempts = job["attempts"] + 1
+        if permanent or attempts >= MAX_ATTEMPTS:
+            state, next_at = "failed", 0
+        else:
+            state, next_at = _RUNNING[running], now + RETRY_BACKOFF * 2 ** (attempts - 1)
+        self.db.execute(
+            "UPDATE jobs SET state = ?, attempts = ?, error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (state, attempts, error, next_at, now, job["id"]),
+        )
+        self.db.execute("INSERT INTO job_errors (job_id, at, stage, error) VALUES (?, ?, ?, ?)",
+                        (job["id"], now, running, error))
+        return state
+
+    def archivable(self) -> list[sqlite3.Row]:
+        cutoff = time.time() - ARCHIVE_AFTER_DAYS * 24 * 3600
+        return self.db.execute(
+            "SELECT * FROM jobs WHERE state = 'corrected' AND source_mtime < ?", (cutoff,)
+        ).fetchall()
+
+    def archived(self, job: sqlite3.Row, dest: Path):
+        self.db.execute("UPDATE jobs SET state = 'archived', archived_path = ?, updated_at = ? WHERE id = ?",
+                        (str(dest), time.time(), job["id"]))
+
+    def find(self, name: str) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT * FROM jobs WHERE path = ? OR path LIKE ? ORDER BY created_at",
+            (name, f"%/{name}"),
+        ).fetchall()
+
+    def retry(self, job: sqlite3.Row):
+        """Put a failed job back at the stage it failed in, without touching any files."""
+        if job["state"] != "failed":
+            return
+        last = self.db.execute(
+            "SELECT stage FROM job_errors WHERE job_id = ? ORDER BY at DESC LIMIT 1", (job["id"],)
+        ).fetchone()
+        state = _RUNNING.get(last["stage"] if last else "", "pending")
+        self.db.execute(
+            "UPDATE jobs SET state = ?, attempts = 0, next_attempt_at = 0, updated_at = ? WHERE id = ?",
+            (state, time.time(), job["id"]),
+        )
+
+    def set_priority(self, job: sqlite3.Row, priority: int):
+        self.db.execute("UPDATE jobs SET priority = ?, updated_at = ? WHERE id = ?",
+                        (priority, time.time(), job["id"]))
+
+    def stats(self) -> dict:
+        depth = {r["state"]: r["n"] for r in self.db.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state")}
+        latency = self.db.execute(
+            "SELECT AVG(asr_started_at - created_at) AS queue_wait,"
+            " AVG(asr_finished_at - asr_started_at) AS asr,"
+            " AVG(llm_finished_at - llm_started_at) AS llm,"
+            " AVG(llm_finished_at - created_at) AS total"
+            " FROM jobs WHERE llm_finished_at IS NOT NULL"
+        ).fetchone()
+        return {"depth": depth, "avg_seconds": {k: latency[k] for k in latency.keys()}}
 
 
 # ============================================================================
 # Two-phase scan
 # ============================================================================
 
-def scan_and_process():
+def scan_and_process(index: PendingIndex, store: JobStore):
     """Two-phase processing to avoid MLX memory contention.
 
     Phase 1: Transcribe all pending audio files (ASR model loaded).
@@ -336,40 +1422,45 @@ def scan_and_process():
     WATCH_DIR.mkdir(parents=True, exist_ok=True)
     DONE_DIR.mkdir(parents=True, exist_ok=True)
 
-    files = audio_files()
-    if not files:
-        return
+    # --- Enqueue files that have finished arriving (index holds only unknown files) ---
+    for audio_path in index.files():
+        if store.get(audio_path) is None:
+            if not index.is_stable(audio_path):
+                log(f"Waiting for file to stabilize: {audio_path.name}")
+                continue
+            job = store.enqueue(audio_path)
+            log(f"Queued {audio_path.name} ({job['state']})")
+        index.discard(audio_path)
 
     # --- Phase 1: Transcribe all pending files ---
     transcribed_any = False
-    for audio_path in files:
-        if processing_marker(audio_path).exists():
-            continue
-        if raw_md_path(audio_path).exists():
-            continue
-        if not is_file_stable(audio_path):
-            log(f"Waiting for file to stabilize: {audio_path.name}")
+    for job in store.due("pending"):
+        audio_path = Path(job["path"])
+        if not audio_path.exists():
+            store.fail(job, "transcribing", "source file missing", permanent=True)
             continue
 
         stem = audio_path.stem
         chunks_dir = WATCH_DIR / f".chunks_{stem}"
-        marker = processing_marker(audio_path)
-        marker.write_text(str(os.getpid()), encoding='utf-8')
+        store.start(job, "transcribing")
         try:
             log(f"[ASR] Transcribing: {audio_path.name}")
             start = time.time()
             raw_text = transcribe_file(audio_path, chunks_dir)
             raw_out = raw_md_path(audio_path)
             raw_out.write_text(raw_text, encoding='utf-8')
+            store.finish(job, "transcribed")
             log(f"[ASR] Wrote {raw_out.name} ({time.time()-start:.1f}s)")
             transcribed_any = True
         except Exception as e:
-            log(f"[ASR] ERROR {audio_path.name}: {e}")
-        finally:
-            if marker.exists():
-                marker.unlink()
-            # Move chunks to done/ for reference
-            if chunks_dir.exists():
+            state = store.fail(job, "transcribing", str(e))
+            log(f"[ASR] ERROR {audio_path.name} (attempt {job['attempts'] + 1}/{MAX_ATTEMPTS}, now {state}): {e}")
+            # Failed files keep .chunks_<stem> (manifest + failed chunks) for the next attempt
+            continue
+
+        if chunks_dir.exists():
+            if DEBUG_KEEP_CHUNKS or SPLIT_MODE != "pipe":
+                # Move chunks to done/ for reference
                 dest_chunks = DONE_DIR / f"chunks_{stem}"
                 if dest_chunks.exists():
                     shutil.rmtree(dest_chunks, ignore_errors=True)
@@ -377,51 +1468,38 @@ def scan_and_process():
                     shutil.move(str(chunks_dir), str(dest_chunks))
                 except Exception:
                     shutil.rmtree(chunks_dir, ignore_errors=True)
-
-    # --- Phase 2: Correct all files with _raw.md but no _corrected.md ---
-    pending_correction = []
-    for audio_path in audio_files():
-        if raw_md_path(audio_path).exists() and not corrected_md_path(audio_path).exists():
-            pending_correction.append(audio_path)
-
-    if not pending_correction:
-        # Move any fully-done files
-        for audio_path in audio_files():
-            if raw_md_path(audio_path).exists() and corrected_md_path(audio_path).exists():
-                _move_to_done(audio_path)
-        return
-
-    # Unload ASR model before LLM work
-    if transcribed_any:
-        unload_asr_model()
-        time.sleep(2)
-
-    for audio_path in pending_correction:
-        raw_text = raw_md_path(audio_path).read_text(encoding='utf-8')
-        corrected_out = corrected_md_path(audio_path)
-
-        marker = processing_marker(audio_path)
-        marker.write_text(str(os.getpid()), encoding='utf-8')
-        try:
-            log(f"[LLM] Correcting: {audio_path.name}")
-            corrected = correct_text(raw_text)
-            corrected_out.write_text(corrected, encoding='utf-8')
-            log(f"[LLM] Wrote {corrected_out.name}")
-        except Exception as e:
-            log(f"[LLM] ERROR {audio_path.name}: {e}")
-        finally:
-            if marker.exists():
-                marker.unlink()
-
-        _move_to_done(audio_path)
-
-
-def _move_to_done(audio_path: Path):
-    # Keep files in staging area for 7 days before moving to done/
-    now = time.time()
-    if now - audio_path.stat().st_mtime < 7 * 24 * 3600:
-        return
-
+            else:
+                shutil.rmtree(chunks_dir, ignore_errors=True)
+
+    # --- Phase 2: Correct all transcribed files ---
+    pending_correction = store.due("transcribed")
+    if pending_correction:
+        # Unload ASR model before LLM work
+        if transcribed_any:
+            unload_asr_model()
+            time.sleep(2)
+
+        for job in pending_correction:
+            audio_path = Path(job["path"])
+            corrected_out = corrected_md_path(audio_path)
+            store.start(job, "correcting")
+            try:
+                raw_text = raw_md_path(audio_path).read_text(encoding='utf-8')
+                log(f"[LLM] Correcting: {audio_path.name}")
+                correct_text(raw_text, corrected_out)
+                store.finish(job, "corrected")
+                log(f"[LLM] Wrote {corrected_out.name}")
+            except Exception as e:
+                state = store.fail(job, "correcting", str(e))
+                log(f"[LLM] ERROR {audio_path.name} (attempt {job['attempts'] + 1}/{MAX_ATTEMPTS}, now {state}): {e}")
+
+    # --- Archive finished recordings after ARCHIVE_AFTER_DAYS ---
+    for job in store.archivable():
+        _move_to_done(job, store)
+
+
+def _move_to_done(job: sqlite3.Row, store: JobStore):
+    audio_path = Path(job["path"])
     DONE_DIR.mkdir(parents=True, exist_ok=True)
     dest = DONE_DIR / audio_path.name
     if dest.exists():
@@ -432,33 +1510,100 @@ def _move_to_done(audio_path: Path):
             i += 1
     try:
         shutil.move(str(audio_path), str(dest))
+        store.archived(job, dest)
         log(f"Moved to done/{dest.name}")
     except Exception as e:
         log(f"Move failed for {audio_path.name}: {e}")
 
 
+def print_jobs(store: JobStore):
+    stats = store.stats()
+    print("Queue depth: " + (", ".join(f"{k}={v}" for k, v in sorted(stats["depth"].items())) or "empty"))
+    avg = stats["avg_seconds"]
+    if avg["total"] is not None:
+        print("Avg seconds: " + ", ".join(f"{k}={v:.0f}" for k, v in avg.items() if v is not None))
+    for job in store.db.execute(
+        "SELECT * FROM jobs WHERE state NOT IN ('archived') ORDER BY priority DESC, created_at"
+    ):
+        line = f"  [{job['state']:<12}] p={job['priority']} attempts={job['attempts']} {Path(job['path']).name}"
+        if job["error"]:
+            line += f"  error: {job['error'][:120]}"
+        print(line)
+
+
 # ============================================================================
 # Main loop
 # ============================================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="Transcribe daemon")
+    parser.add_argument(
+        "--bench-prefix-cache", nargs="?", const="", metavar="SAMPLE_TXT",
+        help="measure correction TTFT with vs. without the shared prompt prefix, then exit",
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="bench rounds (default 5)")
+    parser.add_argument("--jobs", action="store_true", help="show queue depth, latencies and open jobs, then exit")
+    parser.add_argument("--retry", metavar="FILE", help="re-queue a failed job at the stage it failed in")
+    parser.add_argument("--priority", nargs=2, metavar=("FILE", "N"), help="set a job's priority (higher runs first)")
+    args = parser.parse_args()
+    if args.bench_prefix_cache is not None:
+        bench_prefix_cache(Path(args.bench_prefix_cache) if args.bench_prefix_cache else None, args.rounds)
+        return
+    if args.jobs or args.retry or args.priority:
+        WATCH_DIR.mkdir(parents=True, exist_ok=True)
+        store = JobStore()
+        name = args.retry or (args.priority[0] if args.priority else None)
+        jobs = store.find(name) if name else []
+        if name and not jobs:
+            sys.exit(f"No job matches {name}")
+        for job in jobs:
+            if args.retry:
+                store.retry(job)
+            else:
+                store.set_priority(job, int(args.priority[1]))
+        print_jobs(store)
+        return
+
     log("Transcribe daemon starting (two-phase, chunked)")
     log(f"Watching: {WATCH_DIR}")
-    log(f"ASR: {ASR_API} ({ASR_MODEL})")
+    log(f"ASR: {', '.join(b.url for b in asr_pool.backends)} ({ASR_MODEL})")
     log(f"LLM: {LLM_API} ({LLM_MODEL})")
-    log(f"Chunk: {CHUNK_MINUTES}min, Workers: {MAX_WORKERS}")
-    log(f"Poll interval: {POLL_INTERVAL}s")
+    log(f"Chunk: {CHUNK_MINUTES}min ({SPLIT_MODE}), Workers: {asr_pool.capacity()}")
 
     WATCH_DIR.mkdir(parents=True, exist_ok=True)
     DONE_DIR.mkdir(parents=True, exist_ok=True)
     cleanup_stale_markers()
+    store = JobStore()
+    recovered = store.recover()
+    if recovered:
+        log(f"Re-queued {recovered} job(s) interrupted by the last shutdown")
+
+    index = PendingIndex()
+    index.rescan()
+    observer = start_observer(index)
+    if observer is not None:
+        rescan_interval = EVENT_RESCAN_INTERVAL
+        log(f"Watch: filesystem events (stable after {STABLE_SECONDS}s)")
+    else:
+        rescan_interval = POLL_INTERVAL
+        log(f"Watch: polling every {POLL_INTERVAL}s (pip install watchdog for events)")
+    last_rescan = time.monotonic()
 
     while True:
+        if time.monotonic() - last_rescan >= rescan_interval:
+            index.rescan()
+            last_rescan = time.monotonic()
+        index.wake.clear()
         try:
-            scan_and_process()
+            scan_and_process(index, store)
         except Exception as e:
             log(f"Scan error: {e}")
-        time.sleep(POLL_INTERVAL)
+        # Sleep until an event arrives, a settling file could be stable, a retry is due, or the next rescan
+        timeout = max(0.0, rescan_interval - (time.monotonic() - last_rescan))
+        for wait_s in (index.next_check_in(), store.next_due_in()):
+            if wait_s is not None:
+                timeout = min(timeout, wait_s + 0.1)
+        index.wake.wait(timeout)
 
 
 if __name__ == "__main__":
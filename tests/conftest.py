@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# server/ is a flat directory of modules run by start_with_admin.py, not a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
@@ -0,0 +1,32 @@
+import asyncio
+from types import SimpleNamespace
+
+from lazy_handler_proxy import LazyHandlerProxy
+
+QUEUE_CONFIG = {"max_concurrency": 4, "timeout": 300, "queue_size": 100}
+
+
+class _FakeProcessProxy(SimpleNamespace):
+    async def get_queue_stats(self) -> dict:
+        # mlx-openai-server's subprocess stats: no configured limits
+        return {"active_requests": 2, "queue_size": 1}
+
+
+def _proxy() -> LazyHandlerProxy:
+    fake = _FakeProcessProxy(_model_cfg_dict={"model_type": "lm"}, model_path="/models/x", model_id="x")
+    return LazyHandlerProxy(fake, QUEUE_CONFIG)
+
+
+def test_queue_stats_report_max_concurrency_before_load():
+    stats = asyncio.run(_proxy().get_queue_stats())
+    assert stats["loaded"] is False
+    assert stats["max_concurrency"] == 4
+
+
+def test_queue_stats_report_max_concurrency_once_loaded():
+    lazy = _proxy()
+    lazy._started = True
+    stats = asyncio.run(lazy.get_queue_stats())
+    assert stats["active_requests"] == 2
+    assert stats["max_concurrency"] == 4
+    assert stats["max_queue_size"] == 100